@@ -16,8 +16,14 @@ logger = logging.getLogger(__name__)
 class DriveAPI:
     """Handles operations with Google Drive API."""
     
-    def __init__(self):
-        """Initialize the Drive API client with credentials."""
+    def __init__(self, session: Optional[requests.Session] = None):
+        """Initialize the Drive API client with credentials.
+        
+        Args:
+            session: Optional shared HTTP session used for file downloads, so
+                connections are kept alive and reused across files
+        """
+        self._session = session or requests.Session()
         try:
             # Set up credentials
             scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
@@ -76,7 +82,7 @@ class DriveAPI:
             url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
             
             # Execute request
-            response = requests.get(url, headers=headers)
+            response = self._session.get(url, headers=headers)
             
             if response.status_code == 200:
                 logger.info(f"Successfully downloaded file {file_id}")
@@ -7,7 +7,7 @@ This module handles interactions with Instagram's Graph API to fetch posts and m
 import os
 import logging
 import requests
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
@@ -15,8 +15,14 @@ logger = logging.getLogger(__name__)
 class InstagramAPI:
     """Handles operations with the Instagram Graph API."""
     
-    def __init__(self):
-        """Initialize Instagram API client with access token and user ID."""
+    def __init__(self, session: Optional[requests.Session] = None):
+        """Initialize Instagram API client with access token and user ID.
+        
+        Args:
+            session: Optional shared HTTP session for Graph API calls and media
+                downloads, so connections are kept alive and reused
+        """
+        self._session = session or requests.Session()
         self.access_token = os.getenv("FACEBOOK_ACCESS_TOKEN")
         self.user_id = os.getenv("IG_USER_ID")
         
@@ -51,7 +57,9 @@ class InstagramAPI:
             params = {
                 'fields': 'id,caption,media_type,media_url,permalink,thumbnail_url,timestamp,children{id,media_type,media_url,permalink,thumbnail_url,timestamp}',
                 'access_token': self.access_token,
-                'limit': limit
+                'limit': limit,
+                # Let the API skip older posts; stored dates are UTC
+                'since': int(earliest_date.replace(tzinfo=timezone.utc).timestamp())
             }
             
             all_posts = []
@@ -59,7 +67,7 @@ class InstagramAPI:
             
             # Fetch posts with pagination
             while url:
-                response = requests.get(url, params=params)
+                response = self._session.get(url, params=params)
                 
                 if response.status_code != 200:
                     logger.error(f"Instagram API error: {response.status_code} - {response.text}")
@@ -104,7 +112,7 @@ class InstagramAPI:
         """
         logger.info(f"Starting download media.")
         try:
-            response = requests.get(media_url, timeout=10)
+            response = self._session.get(media_url, timeout=10)
             
             if response.status_code == 200:
                 return response.content
@@ -7,14 +7,16 @@ analyzes images using OpenAI's vision capabilities, and stores the data in Googl
 """
 import os
 import logging
-import pandas as pd
 import json
+import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime
 from dotenv import load_dotenv
 # Import services
 from services.audio_service import AudioProcessor
 from services.image_analysis import ImageAnalyzer
 from services.sheet_service import SheetService
+from services.cursor_store import CursorStore
 from services.transaction_service import TransactionProcessor
 from api.google_drive import DriveAPI
 from api.instagram import InstagramAPI
@@ -39,13 +41,18 @@ class AnimalRescueManager:
         # Load environment variables
         load_dotenv()
         
+        # One keep-alive HTTP session shared by the Drive and Instagram clients
+        self._http = requests.Session()
+        self._http.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=20))
+        
         # Initialize key services
         self.sheet_service = SheetService()
-        self.drive_api = DriveAPI()
+        self.drive_api = DriveAPI(session=self._http)
         self.image_analyzer = ImageAnalyzer()
-        self.instagram_api = InstagramAPI()
+        self.instagram_api = InstagramAPI(session=self._http)
         self.audio_processor = AudioProcessor()
         self.transaction_processor = TransactionProcessor()
+        self.cursors = CursorStore()
         
         # Load folder IDs from environment
         self.folder_mascotas = os.getenv("FOLDER_MASCOTAS")
@@ -94,17 +101,15 @@ class AnimalRescueManager:
                         analysis_results = self.image_analyzer.analyze_animal_image(
                             image_bytes, formatted_date, None, file_name, file_id
                         )
+                        if analysis_results is None:
+                            raise ValueError("Failed to analyze image")
                     else:  # recibo
                         analysis_results = self.image_analyzer.analyze_receipt_image(
                             image_bytes, formatted_date, drive_url, file_name, file_id
                         )
                     
-                    # Update spreadsheet
-                    if isinstance(analysis_results, list):
-                        for result in analysis_results:
-                            self.sheet_service.insert_sheet_from_dict(result, worksheet)
-                    else:
-                        self.sheet_service.insert_sheet_from_dict(analysis_results, worksheet)
+                    # Update spreadsheet (a list of results goes out in one append)
+                    self.sheet_service.insert_sheet_from_dict(analysis_results, worksheet)
                     
                     # Move file to success folder
                     self.drive_api.move_file(file_id, self.folder_ok_tickets)
@@ -120,17 +125,32 @@ class AnimalRescueManager:
     def process_instagram_posts(self):
         """Process recent Instagram posts and add them to the worksheet."""
         try:
+            # Load every worksheet this phase reads in a single request (EVENTO is
+            # only appended to, so its header row is read on the first insert)
+            self.sheet_service.prefetch([self.worksheet_animal, self.worksheet_interaccion])
+            
             # Get the oldest date in our spreadsheet to know which posts to fetch
             oldest_date = self.sheet_service.get_oldest_date(self.worksheet_animal)
             oldest_id = self.sheet_service.get_oldest_id(self.worksheet_animal)
+            # Posts already handled in a previous run don't need to be fetched again
+            cursor = self.cursors.get("instagram")
+            if cursor:
+                oldest_date = max(oldest_date, datetime.fromisoformat(cursor))
             # Fetch posts from Instagram API
             posts = self.instagram_api.get_recent_posts(oldest_date)
             logger.info(f"Retrieved {len(posts)} posts from Instagram")
             posts = self.filtrarPostNuevos(posts)
             
+            # Posts come oldest first; the cursor only moves past an unbroken
+            # run of posts whose rows were all written, so a failed post is
+            # retried next time; posts that are not about an animal count as handled
+            newest_processed = cursor
+            all_succeeded = True
+            
             # Process each post
             for post in posts:
                 try: 
+                    written = True
                     # Extract post data
                     caption = post.get("caption", "")
                     timestamp = datetime.strptime(post.get("timestamp"), "%Y-%m-%dT%H:%M:%S%z")
@@ -145,7 +165,7 @@ class AnimalRescueManager:
                     print("resp" , resp)
                     image_bytes = []
                     # resp puede ser '0' o '["nombres",[[u,e,d],...]]'
-                    if resp != 0 or resp != "0":
+                    if str(resp).strip() != "0":
                         data = json.loads(resp) 
                         print(data)
                         print(len(data))
@@ -172,29 +192,43 @@ class AnimalRescueManager:
                                 # Analyze animal image
                                 print ("data0: ", data[0])
                                 results = self.image_analyzer.analyze_animal_image(image_bytes, formatted_date, caption,  data[0])
+                                if results is None:
+                                    # The analysis failed (not an IGNORAR answer)
+                                    written = False
+                                    results = []
                                 for i, result in enumerate(results):
                                     oldest_id = oldest_id +1 
                                     nuevo_registro = self.armar_datos_a_insertar(oldest_id,result) 
-                                    self.sheet_service.insert_sheet_from_dict(nuevo_registro, self.worksheet_animal) 
+                                    written &= self.sheet_service.insert_sheet_from_dict(nuevo_registro, self.worksheet_animal) 
                                     media_url= self.getmediaurl(post ,i,media_url)
                                     post_id_children = self.getchildrenid(post ,i,post_id) 
                                     nuevo_registro= self.armar_post_a_insertar(post_id_children,oldest_id,media_url,permalink, formatted_date)
-                                    self.sheet_service.insert_sheet_from_dict(nuevo_registro, self.worksheet_interaccion)
+                                    written &= self.sheet_service.insert_sheet_from_dict(nuevo_registro, self.worksheet_interaccion)
                             else :
                                 nuevo_registro= self.armar_post_a_insertar(post_id,id,media_url,permalink, formatted_date)
-                                self.sheet_service.insert_sheet_from_dict(nuevo_registro, self.worksheet_interaccion)
+                                written &= self.sheet_service.insert_sheet_from_dict(nuevo_registro, self.worksheet_interaccion)
 
                             for evento in data[1] :
                                 print("evento" , evento)
                                 id = id or (oldest_id - cant_names + 1) 
                                 nuevo_evento = self.armar_estado_a_insertar(evento,id, formatted_date) 
-                                self.sheet_service.insert_sheet_from_dict(nuevo_evento, self.worksheet_eventos)
+                                written &= self.sheet_service.insert_sheet_from_dict(nuevo_evento, self.worksheet_eventos)
 
+                    if not written:
+                        all_succeeded = False
+                        logger.error(f"Instagram post {post_id} was not fully written, it will be retried")
+                        continue
                     logger.info(f"Successfully processed Instagram post {post_id}")
+                    if all_succeeded:
+                        newest_processed = timestamp.replace(tzinfo=None).isoformat()
                     
                 except Exception as e:
+                    all_succeeded = False
                     logger.error(f"Error processing Instagram post {post_id}: {str(e)}")
             
+            if newest_processed != cursor:
+                self.cursors.set("instagram", newest_processed)
+            
         except Exception as e:
             logger.error(f"Failed to process Instagram posts: {str(e)}")
     def getmediaurl(self,post,i,media_url):
@@ -209,9 +243,8 @@ class AnimalRescueManager:
             return post_id
 
     def filtrarPostNuevos(self, post_list):
-        # traer existentes y pasarlos a set para lookup O(1)
-        df = pd.DataFrame(self.worksheet_interaccion.get_all_records())
-        existentes = set(df['contenido'].dropna().astype(str)) if (not df.empty and 'contenido' in df.columns) else set()
+        # traer existentes (del snapshot ya leído) y pasarlos a set para lookup O(1)
+        existentes = set(self.sheet_service.get_column_values(self.worksheet_interaccion, 'contenido'))
 
         # filtrar por permalink
         post_nuevos = [p for p in post_list if str(p.get('permalink', '')) not in existentes]
@@ -296,12 +329,19 @@ class AnimalRescueManager:
         
         logger.info("Processing complete")
 
+    def close(self):
+        """Release the shared HTTP connections."""
+        self._http.close()
+
 
 if __name__ == "__main__":
     try:
         app = AnimalRescueManager()
-        app.run()
-        # Uncomment to run the voice assistant mode
-        # app.run_voice_assistant()
+        try:
+            app.run()
+            # Uncomment to run the voice assistant mode
+            # app.run_voice_assistant()
+        finally:
+            app.close()
     except Exception as e:
         logger.critical(f"Application failed: {str(e)}")
\ No newline at end of file
@@ -162,8 +162,8 @@ def merge_excel_files(excel_folder, output_name="transaccion_unificadas.xlsx"):
         print("No Excel files found in the specified folder.")
         return None
     
-    # Merge all Excel files
-    combined_df = pd.DataFrame()
+    # Merge all Excel files; frames are collected and concatenated once
+    dfs = []
     
     for excel_file in excel_files:
         try:
@@ -183,10 +183,12 @@ def merge_excel_files(excel_folder, output_name="transaccion_unificadas.xlsx"):
                         df[col] = df[col].astype(str)
             
             
-            combined_df = pd.concat([combined_df, df], ignore_index=True)
+            dfs.append(df)
         except Exception as e:
             print(f"    Error reading {excel_file}: {e}")
     
+    combined_df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+    
     if combined_df.empty:
         print("No data found in Excel files.")
         return None
@@ -0,0 +1,53 @@
+# src/services/cursor_store.py
+"""
+Cursor Store Module
+
+This module remembers, per source, the timestamp of the newest item processed
+successfully so that later runs only fetch what is newer.
+"""
+import os
+import logging
+from typing import Optional
+
+from utils.helpers import get_cache_dir, load_json_from_file, save_json_to_file
+
+logger = logging.getLogger(__name__)
+
+class CursorStore:
+    """Keeps source -> last processed timestamp in a local JSON file."""
+
+    def __init__(self, cursor_file: Optional[str] = None):
+        """Load the stored cursors.
+
+        Args:
+            cursor_file: Path to the JSON file (defaults to CURSOR_FILE env var,
+                then cursors.json in the cache directory)
+        """
+        self.cursor_file = cursor_file or os.getenv("CURSOR_FILE") or os.path.join(get_cache_dir(), "cursors.json")
+        self._cursors = {}
+        if os.path.exists(self.cursor_file):
+            self._cursors = load_json_from_file(self.cursor_file) or {}
+
+    def get(self, source: str) -> Optional[str]:
+        """Get the last processed timestamp stored for a source.
+
+        Args:
+            source: Source key (e.g. "instagram")
+
+        Returns:
+            The stored timestamp string or None if the source has no cursor yet
+        """
+        return self._cursors.get(source)
+
+    def set(self, source: str, timestamp: str) -> bool:
+        """Store the last processed timestamp for a source.
+
+        Args:
+            source: Source key (e.g. "instagram")
+            timestamp: Timestamp of the newest item processed successfully
+
+        Returns:
+            True if the cursor file was saved, False otherwise
+        """
+        self._cursors[source] = timestamp
+        return save_json_to_file(self._cursors, self.cursor_file)
@@ -4,21 +4,149 @@ Image Analysis Service
 
 This module handles animal and receipt image analysis using OpenAI's vision capabilities.
 """
-import json
 import base64
 import logging
+import functools
 from typing import Dict, List, Union, Optional
-from openai import OpenAI
+import httpx
+import orjson
+from openai import DEFAULT_CONNECTION_LIMITS, DefaultHttpxClient, OpenAI
 import os
+from services.image_cache import PerceptualHashCache
 
 logger = logging.getLogger(__name__)
 
+
+@functools.lru_cache(maxsize=1)
+def _get_openai_client() -> OpenAI:
+    """Return the process-wide OpenAI client, created on first use.
+    
+    Sharing one client keeps a single connection pool no matter how many
+    analyzers are created. HTTP/2 lets concurrent requests multiplex over one
+    connection; it needs the optional 'h2' package, so fall back to HTTP/1.1
+    keep-alive when it is missing. The SDK's own client is used so its other
+    defaults (timeouts, redirects, connection limits) are kept.
+    """
+    limits = httpx.Limits(
+        max_connections=DEFAULT_CONNECTION_LIMITS.max_connections,
+        max_keepalive_connections=20,
+        keepalive_expiry=DEFAULT_CONNECTION_LIMITS.keepalive_expiry,
+    )
+    try:
+        http_client = DefaultHttpxClient(http2=True, limits=limits)
+    except ImportError:
+        http_client = DefaultHttpxClient(limits=limits)
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
+
+# Record column -> key in the model's JSON answer, for fields copied verbatim
+_ANIMAL_RECORD_FIELDS = (
+    ("Nombre", "Nombre"),
+    ("Tipo Animal", "tipo_animal"),
+    ("Ubicacion", "Ubicacion"),
+    ("Edad", "Edad"),
+    ("Condición de Salud Inicial", "Condición de Salud Inicial"),
+)
+
+# Prompt templates are constant, so they are built once at import time
+_ANIMAL_JSON_EXAMPLE = (
+    '[\n'
+    '  {\n'
+    '    "Nombre": "nombre_individual_del_animal",\n'
+    '    "tipo_animal": "perro o gato",\n'
+    '    "color_pelo": [\n'
+    '      { "color": "color1", "porcentaje": 70 },\n'
+    '      { "color": "color2", "porcentaje": 30 }\n'
+    '    ],\n'
+    '    "Edad": "2 años",\n'
+    '    "Condición de Salud Inicial": "describir cómo fue recibido",\n'
+    '    "Ubicacion": "lugar donde fue encontrado"\n'
+    '  },\n'
+    '  {\n'
+    '    "Nombre": "otro_animal_si_hay_varios",\n'
+    '    "tipo_animal": "perro o gato",\n'
+    '    "color_pelo": [\n'
+    '      { "color": "negro", "porcentaje": 100 }\n'
+    '    ],\n'
+    '    "Edad": "6 meses",\n'
+    '    "Condición de Salud Inicial": "sano",\n'
+    '    "Ubicacion": "CABA"\n'
+    '  }\n'
+    ']\n'
+)
+
+_ANIMAL_SYSTEM_PROMPT = (
+    "Eres un asistente que analiza imágenes de mascotas y sus descripciones en redes sociales. "
+    "Tu tarea es generar un JSON ARRAY válido con la siguiente estructura:\n\n"
+    + _ANIMAL_JSON_EXAMPLE +
+    "\n\n"
+    "REGLAS IMPORTANTES:\n"
+    "1. Si hay múltiples animales mencionados, crea UN OBJETO JSON SEPARADO para cada animal dentro del array\n"
+    "2. Cada animal debe tener su propio objeto con su nombre individual (NUNCA concatenes nombres)\n"
+    "3. Si solo hay un animal, devuelve un array con un solo objeto\n"
+    "4. La respuesta debe empezar con [ y terminar con ]\n"
+    "5. Si no hay mascotas visibles o mencionadas (imagen informativa, sorteo, cartel), respondé: IGNORAR\n\n"
+    
+    "INSTRUCCIONES DE ANÁLISIS:\n"
+    "• Basate tanto en la imagen como en el texto que la acompaña\n"
+    "• Estimá la edad del animal si es posible (siempre incluir 'años' o 'meses')\n"
+    "• Si se menciona un lugar o barrio donde fue encontrado, usalo en 'Ubicacion'\n"
+    "• Identifica colores predominantes del pelaje con porcentaje aproximado (máximo 2 colores)\n"
+    "• Usa menciones de enfermedades, tratamientos o condiciones para 'Condición de Salud Inicial'\n\n"
+    
+    "FORMATO DE CAMPOS:\n"
+    "• 'Nombre': Nombre individual del animal (sin comas ni concatenaciones)\n"
+    "• 'tipo_animal': Solo 'perro' o 'gato'\n"
+    "• 'Edad': Incluir unidad ('2 años', '6 meses') - NUNCA solo números\n"
+    "• 'color_pelo': Array de objetos con color y porcentaje\n"
+    "• 'Condición de Salud Inicial': Estado cuando fue recibido/rescatado\n"
+    "• 'Ubicacion': Lugar específico donde fue encontrado (si se menciona)\n\n"
+    
+    "⚠ FORMATO DE RESPUESTA:\n"
+    "- NO uses bloques de código markdown\n"
+    "- NO agregues texto explicativo\n"
+    "- Devolvé SOLAMENTE el JSON array válido\n"
+    "- La respuesta debe empezar con [ y terminar con ]\n"
+    
+    "EJEMPLOS VÁLIDOS:\n"
+    "Un animal: [{'Nombre': 'max', 'tipo_animal': 'perro', ...}]\n"
+    "Múltiples: [{'Nombre': 'luna', ...}, {'Nombre': 'sol', ...}]\n"
+    "Sin animales: IGNORAR"
+)
+
+_RECEIPT_JSON_EXAMPLE = (
+    '{\n'
+    '  "Fecha": "25/01/2024 15:02:24",\n'
+    '  "Proveedor": "Centro Veterinario Linares",\n'
+    '  "Tipo de Gasto": "Puede ser Veterinaria  Alimentos en el detalle iria medicacion farmacio u otros",\n'
+    '  "Mascota": "Nombre de la mascota si figura",\n'
+    '  "Responsable": "Nombre del cliente si figura en el ticket",\n'
+    '  "Detalle": "APLICACION INTRAMUS. /S. CUTANEA.",\n'
+    '  "Monto": 3000.00,\n'
+    '  "Forma de Pago": "MERCADOPAGO",\n'
+    '  "Observaciones": ""\n'
+    '}'
+)
+
+_RECEIPT_SYSTEM_PROMPT = (
+    "Eres un asistente que analiza imágenes de recibos o facturas para cargar datos en un Excel. "
+    "Devuelve SOLO un objeto JSON con los siguientes campos: \n"
+    + _RECEIPT_JSON_EXAMPLE +
+    "\nSi algún campo no está presente o no se puede deducir de la imagen, usa ' '.\n"
+    "IMPORTANTE: Devuelve ÚNICAMENTE el objeto JSON sin marcadores de código, sin texto explicativo adicional. "
+    "El JSON debe comenzar con el carácter { y terminar con }"
+)
+
+
 class ImageAnalyzer:
     """Handles image analysis using AI vision models."""
     
+    # The receipt system message never changes between calls
+    _RECEIPT_SYSTEM_MESSAGE = {"role": "system", "content": _RECEIPT_SYSTEM_PROMPT}
+    
     def __init__(self):
-        """Initialize the image analyzer with the OpenAI client."""
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        """Initialize the image analyzer with the shared OpenAI client."""
+        self.client = _get_openai_client()
+        self.image_cache = PerceptualHashCache()
         logger.info("Image analyzer initialized")
         
     def _clean_json_response(self, response: str) -> str:
@@ -36,7 +164,7 @@ class ImageAnalyzer:
             response = response[:-3].strip()
         return response
     
-    def analyze_animal_image(self,image_bytes,date_time: str,caption: Optional[str], names) -> List[Dict]:
+    def analyze_animal_image(self,image_bytes,date_time: str,caption: Optional[str], names) -> Optional[List[Dict]]:
         """Analyze an animal image using OpenAI's vision model.
         
         Args:
@@ -47,9 +175,19 @@ class ImageAnalyzer:
             url: URL to access the image
             
         Returns:
-            List of dictionaries containing analyzed animal data
+            List of dictionaries containing analyzed animal data (empty if the
+            image is not an animal), or None if the analysis failed
         """         
         try: 
+            # A near-duplicate of an already analyzed image reuses what was
+            # seen in it; the caption is still analyzed for this post
+            image_hash = None
+            cached_records = None
+            if not isinstance(image_bytes, list):
+                image_hash = self.image_cache.compute_hash(image_bytes)
+                if image_hash is not None:
+                    cached_records = self._matching_cached_records(image_hash, names)
+            
             caption_text = caption or ""
             
             # Define system prompt with analysis requirements
@@ -62,12 +200,15 @@ class ImageAnalyzer:
                 "type": "text",
                 "text": (
                     f"Descripción del post:\n{caption_text}\n\n"
-                    "Analiza esta(s) imagen(es) junto al texto:"
+                    + ("Analiza el texto:" if cached_records is not None
+                       else "Analiza esta(s) imagen(es) junto al texto:")
                 )
             })
             
             # Manejar una o múltiples imágenes
-            if isinstance(image_bytes, list):
+            if cached_records is not None:
+                logger.info(f"Image {names} matches a cached analysis, skipping the image upload")
+            elif isinstance(image_bytes, list):
                 # MÚLTIPLES IMÁGENES
                 for i, img_bytes in enumerate(image_bytes):
                     base64_img = base64.b64encode(img_bytes).decode()
@@ -108,49 +249,96 @@ class ImageAnalyzer:
             cleaned_response = self._clean_json_response(result)
 
             try:
-                analysis_array = json.loads(cleaned_response)
+                analysis_array = orjson.loads(cleaned_response)
                 
                 # Si por alguna razón devuelve un objeto en lugar de array, convertir
                 if isinstance(analysis_array, dict):
                     analysis_array = [analysis_array]
                 elif not isinstance(analysis_array, list):
                     logger.error(f"Unexpected response format: {type(analysis_array)}")
-                    return []
+                    return None
                     
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 logger.error(f"Error parsing JSON response: {e}")
                 logger.error(f"Raw response: {result}")
-                return []
+                return None
 
             print("avanzando")
 
+            # Shared fields and defaults are set once; each animal only
+            # overrides what the model actually returned
+            base_record = {
+                "Nombre": "Sin nombre",
+                "Fecha": date_time,
+                "Tipo Animal": "No determinado",
+                "Ubicacion": "No determinado",
+                "Color de pelo": "No determinado",
+                "Edad": "No determinado",
+                "Condición de Salud Inicial": "No determinado"
+            }
+
             # Process each animal in the array
             records = []
             for animal_data in analysis_array:
-                # Process color information
-                color_info = animal_data.get("color_pelo", "No determinado")
-                if isinstance(color_info, list):
-                    color_string = json.dumps(color_info, ensure_ascii=False)
-                else:
-                    color_string = str(color_info)
+                record = base_record.copy()
+                record.update(
+                    (field, animal_data[key]) for field, key in _ANIMAL_RECORD_FIELDS if key in animal_data
+                )
                 
-                record = {
-                    "Nombre": animal_data.get("Nombre", "Sin nombre"),
-                    "Fecha": date_time,
-                    "Tipo Animal": animal_data.get("tipo_animal", "No determinado"),
-                    "Ubicacion": animal_data.get("Ubicacion", "No determinado"),
-                    "Color de pelo": color_string,
-                    "Edad": animal_data.get("Edad", "No determinado"), 
-                    "Condición de Salud Inicial": animal_data.get("Condición de Salud Inicial", "No determinado")
-                }
+                # Process color information
+                if "color_pelo" in animal_data:
+                    color_info = animal_data["color_pelo"]
+                    if isinstance(color_info, list):
+                        record["Color de pelo"] = orjson.dumps(color_info).decode()
+                    else:
+                        record["Color de pelo"] = str(color_info)
                 records.append(record)
 
+            if cached_records is not None:
+                self._reuse_image_fields(records, cached_records)
+            elif image_hash is not None and records:
+                self.image_cache.add(image_hash, records)
+
             logger.info(f"Successfully analyzed image {names}, found {len(records)} records")
             print(records)
             return records
         except Exception as e:
             logger.error(f"Error analyzing animal image {names}: {str(e)}")
-            return []
+            return None
+    
+    def _matching_cached_records(self, image_hash: int, names) -> Optional[List[Dict]]:
+        """Find a cached analysis that can stand in for the vision call.
+        
+        Args:
+            image_hash: Perceptual hash of the current image
+            names: Comma-separated animal names detected for the current post
+            
+        Returns:
+            The cached records, or None if there are none or they describe a
+            different number of animals than the current post names
+        """
+        cached_records = self.image_cache.lookup(image_hash)
+        if cached_records is None:
+            return None
+        name_count = len(names.split(",")) if names else 0
+        if name_count != len(cached_records):
+            logger.info(f"Image {names} matches a cached analysis of {len(cached_records)} animals, analyzing it again")
+            return None
+        return cached_records
+    
+    def _reuse_image_fields(self, records: List[Dict], cached_records: List[Dict]) -> None:
+        """Copy the fields seen in the image from a cached analysis.
+        
+        Only the animal type and coat colour come from the image; name, age,
+        location and health come from the current caption and are kept.
+        
+        Args:
+            records: Records analyzed from the current caption, updated in place
+            cached_records: Records from the matching cached analysis, one per animal
+        """
+        for record, cached in zip(records, cached_records):
+            record["Tipo Animal"] = cached["Tipo Animal"]
+            record["Color de pelo"] = cached["Color de pelo"]
     
     def analyze_receipt_image(self,image_bytes: bytes,date_time: str,url: str,name: str,image_id: str ) -> Dict:
         """Analyze a receipt image using OpenAI's vision model.
@@ -171,14 +359,11 @@ class ImageAnalyzer:
             # Convert image to base64
             base64_image = base64.b64encode(image_bytes).decode()
             
-            # Define system prompt with analysis requirements
-            system_prompt = self._get_receipt_prompt_template()
-            
             # Call OpenAI API for image analysis
             response = self.client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    self._RECEIPT_SYSTEM_MESSAGE,
                     {
                         "role": "user",
                         "content": [
@@ -206,7 +391,7 @@ class ImageAnalyzer:
             
             # Clean and parse JSON response
             cleaned_response = self._clean_json_response(result)
-            receipt_data = json.loads(cleaned_response)
+            receipt_data = orjson.loads(cleaned_response)
             
             # Add additional metadata
             receipt_data["Foto"] = url
@@ -244,8 +429,8 @@ class ImageAnalyzer:
             ) 
         result = response.choices[0].message.content
         print("result chatgpt ",result)
-        if result !=0:
-            resultj =json.loads(result) 
+        if result.strip() != "0":
+            resultj =orjson.loads(result) 
             names= resultj[0].split(",") 
             print("result json ",resultj)
             logger.info(f"Successfully ,found {len(names)} animals")
@@ -255,95 +440,11 @@ class ImageAnalyzer:
     
     def _get_animal_prompt_template(self) -> str:
         """Return the system prompt template for animal image analysis."""
-        json_example = (
-            '[\n'
-            '  {\n'
-            '    "Nombre": "nombre_individual_del_animal",\n'
-            '    "tipo_animal": "perro o gato",\n'
-            '    "color_pelo": [\n'
-            '      { "color": "color1", "porcentaje": 70 },\n'
-            '      { "color": "color2", "porcentaje": 30 }\n'
-            '    ],\n'
-            '    "Edad": "2 años",\n'
-            '    "Condición de Salud Inicial": "describir cómo fue recibido",\n'
-            '    "Ubicacion": "lugar donde fue encontrado"\n'
-            '  },\n'
-            '  {\n'
-            '    "Nombre": "otro_animal_si_hay_varios",\n'
-            '    "tipo_animal": "perro o gato",\n'
-            '    "color_pelo": [\n'
-            '      { "color": "negro", "porcentaje": 100 }\n'
-            '    ],\n'
-            '    "Edad": "6 meses",\n'
-            '    "Condición de Salud Inicial": "sano",\n'
-            '    "Ubicacion": "CABA"\n'
-            '  }\n'
-            ']\n'
-        )
-        
-        return (
-            "Eres un asistente que analiza imágenes de mascotas y sus descripciones en redes sociales. "
-            "Tu tarea es generar un JSON ARRAY válido con la siguiente estructura:\n\n"
-            + json_example +
-            "\n\n"
-            "REGLAS IMPORTANTES:\n"
-            "1. Si hay múltiples animales mencionados, crea UN OBJETO JSON SEPARADO para cada animal dentro del array\n"
-            "2. Cada animal debe tener su propio objeto con su nombre individual (NUNCA concatenes nombres)\n"
-            "3. Si solo hay un animal, devuelve un array con un solo objeto\n"
-            "4. La respuesta debe empezar con [ y terminar con ]\n"
-            "5. Si no hay mascotas visibles o mencionadas (imagen informativa, sorteo, cartel), respondé: IGNORAR\n\n"
-            
-            "INSTRUCCIONES DE ANÁLISIS:\n"
-            "• Basate tanto en la imagen como en el texto que la acompaña\n"
-            "• Estimá la edad del animal si es posible (siempre incluir 'años' o 'meses')\n"
-            "• Si se menciona un lugar o barrio donde fue encontrado, usalo en 'Ubicacion'\n"
-            "• Identifica colores predominantes del pelaje con porcentaje aproximado (máximo 2 colores)\n"
-            "• Usa menciones de enfermedades, tratamientos o condiciones para 'Condición de Salud Inicial'\n\n"
-            
-            "FORMATO DE CAMPOS:\n"
-            "• 'Nombre': Nombre individual del animal (sin comas ni concatenaciones)\n"
-            "• 'tipo_animal': Solo 'perro' o 'gato'\n"
-            "• 'Edad': Incluir unidad ('2 años', '6 meses') - NUNCA solo números\n"
-            "• 'color_pelo': Array de objetos con color y porcentaje\n"
-            "• 'Condición de Salud Inicial': Estado cuando fue recibido/rescatado\n"
-            "• 'Ubicacion': Lugar específico donde fue encontrado (si se menciona)\n\n"
-            
-            "⚠ FORMATO DE RESPUESTA:\n"
-            "- NO uses bloques de código markdown\n"
-            "- NO agregues texto explicativo\n"
-            "- Devolvé SOLAMENTE el JSON array válido\n"
-            "- La respuesta debe empezar con [ y terminar con ]\n"
-            
-            "EJEMPLOS VÁLIDOS:\n"
-            "Un animal: [{'Nombre': 'max', 'tipo_animal': 'perro', ...}]\n"
-            "Múltiples: [{'Nombre': 'luna', ...}, {'Nombre': 'sol', ...}]\n"
-            "Sin animales: IGNORAR"
-        )
+        return _ANIMAL_SYSTEM_PROMPT
     
     def _get_receipt_prompt_template(self) -> str:
         """Return the system prompt template for receipt image analysis."""
-        json_example = (
-            '{\n'
-            '  "Fecha": "25/01/2024 15:02:24",\n'
-            '  "Proveedor": "Centro Veterinario Linares",\n'
-            '  "Tipo de Gasto": "Puede ser Veterinaria  Alimentos en el detalle iria medicacion farmacio u otros",\n'
-            '  "Mascota": "Nombre de la mascota si figura",\n'
-            '  "Responsable": "Nombre del cliente si figura en el ticket",\n'
-            '  "Detalle": "APLICACION INTRAMUS. /S. CUTANEA.",\n'
-            '  "Monto": 3000.00,\n'
-            '  "Forma de Pago": "MERCADOPAGO",\n'
-            '  "Observaciones": ""\n'
-            '}'
-        )
-        
-        return (
-            "Eres un asistente que analiza imágenes de recibos o facturas para cargar datos en un Excel. "
-            "Devuelve SOLO un objeto JSON con los siguientes campos: \n"
-            + json_example +
-            "\nSi algún campo no está presente o no se puede deducir de la imagen, usa ' '.\n"
-            "IMPORTANTE: Devuelve ÚNICAMENTE el objeto JSON sin marcadores de código, sin texto explicativo adicional. "
-            "El JSON debe comenzar con el carácter { y terminar con }"
-        )
+        return _RECEIPT_SYSTEM_PROMPT
     
     def _get_caption_prompt_template(self)-> str:
         return ("""Devolvé SOLO la salida mínima indicada. Nada de texto extra.
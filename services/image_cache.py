@@ -0,0 +1,101 @@
+# src/services/image_cache.py
+"""
+Image Cache Module
+
+This module keeps perceptual hashes of analyzed images so that near-duplicate
+images (reposts, the same photo cropped or recompressed) can reuse a previous
+analysis instead of calling the vision model again.
+"""
+import os
+import sqlite3
+import logging
+from io import BytesIO
+from typing import Dict, List, Optional
+
+import imagehash
+import numpy as np
+import orjson
+from PIL import Image
+
+from utils.helpers import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+class PerceptualHashCache:
+    """Stores image analysis results keyed by a 64-bit perceptual hash."""
+
+    def __init__(self, db_path: Optional[str] = None, max_distance: int = 5):
+        """Open the cache database and load the known hashes into memory.
+
+        Args:
+            db_path: Path to the SQLite database (defaults to IMAGE_CACHE_DB env var,
+                then image_cache.sqlite in the cache directory)
+            max_distance: Maximum Hamming distance for two images to count as the same
+        """
+        self.db_path = db_path or os.getenv("IMAGE_CACHE_DB") or os.path.join(get_cache_dir(), "image_cache.sqlite")
+        self.max_distance = max_distance
+
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS phashes (hash TEXT NOT NULL, record_json TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+        # Hashes are stored as hex text because SQLite integers are signed 64-bit
+        rows = self._conn.execute("SELECT hash, record_json FROM phashes").fetchall()
+        self._hashes = np.array([int(h, 16) for h, _ in rows], dtype=np.uint64)
+        self._records = [record_json for _, record_json in rows]
+        logger.info(f"Image cache loaded with {len(self._records)} hashes")
+
+    def compute_hash(self, image_bytes: bytes) -> Optional[int]:
+        """Compute the perceptual hash of an image.
+
+        Args:
+            image_bytes: The raw image data
+
+        Returns:
+            The 64-bit hash as an int or None if the image could not be decoded
+        """
+        try:
+            return int(str(imagehash.phash(Image.open(BytesIO(image_bytes)))), 16)
+        except Exception as e:
+            logger.warning(f"Could not hash image: {str(e)}")
+            return None
+
+    def lookup(self, image_hash: int) -> Optional[List[Dict]]:
+        """Find the analysis of the closest known image.
+
+        Args:
+            image_hash: Perceptual hash of the new image
+
+        Returns:
+            The cached records or None if no image is within max_distance
+        """
+        hashes = self._hashes
+        if not len(hashes):
+            return None
+
+        # Hamming distance against every known hash at once
+        xor = np.bitwise_xor(hashes, np.uint64(image_hash))
+        distances = np.unpackbits(xor.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+        best = int(distances.argmin())
+        if distances[best] > self.max_distance:
+            return None
+
+        return orjson.loads(self._records[best])
+
+    def add(self, image_hash: int, records: List[Dict]) -> None:
+        """Store the analysis of a new image.
+
+        Args:
+            image_hash: Perceptual hash of the image
+            records: Records produced by the analysis
+        """
+        record_json = orjson.dumps(records).decode()
+        self._conn.execute(
+            "INSERT INTO phashes (hash, record_json) VALUES (?, ?)",
+            (f"{image_hash:016x}", record_json)
+        )
+        self._conn.commit()
+        self._records.append(record_json)
+        self._hashes = np.append(self._hashes, np.uint64(image_hash))
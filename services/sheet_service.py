@@ -5,29 +5,90 @@ Google Sheets Service Module
 This module handles interactions with Google Sheets for data storage and retrieval.
 """
 import os
+import re
 import logging
+import functools
+import time
 import gspread
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Union
-from oauth2client.service_account import ServiceAccountCredentials
+from typing import Dict, List, Any, Optional, Tuple, Union
+from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
+# dd/mm/yyyy or yyyy-mm-dd, optionally followed by a time
+_DATE_RE = re.compile(
+    r"^(?:(\d{1,2})/(\d{1,2})/(\d{4})|(\d{4})-(\d{1,2})-(\d{1,2}))"
+    r"(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}))?)?$"
+)
+
+def _date_key(date_str: str) -> Optional[int]:
+    """Convert a sheet date to a sortable yyyymmddHHMMSS integer, or None if it does not match."""
+    match = _DATE_RE.match(date_str)
+    if match is None:
+        return None
+    day, month, year, iso_year, iso_month, iso_day, hour, minute, second = match.groups()
+    if year is None:
+        year, month, day = iso_year, iso_month, iso_day
+    return (int(year) * 10**10 + int(month) * 10**8 + int(day) * 10**6
+            + int(hour or 0) * 10**4 + int(minute or 0) * 100 + int(second or 0))
+
+def _key_to_datetime(key: int) -> datetime:
+    """Convert a yyyymmddHHMMSS integer back to a datetime (ValueError if impossible)."""
+    return datetime(
+        key // 10**10, key // 10**8 % 100, key // 10**6 % 100,
+        key // 10**4 % 100, key // 100 % 100, key % 100
+    )
+
+@functools.lru_cache(maxsize=1024)
+def _col_letter(col: int) -> str:
+    """Convert a 1-based column index to its A1 letters (1 -> A, 27 -> AA)."""
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
 class SheetService:
     """Handles operations with Google Sheets API."""
     
+    # Rows are appended in chronological order, so the newest date sits at the
+    # bottom and get_oldest_date can take the last one. Turn this off for
+    # sheets whose rows are not kept in date order.
+    DATES_APPEND_ONLY = True
+    
+    # Trailing rows checked for that last date before scanning the whole
+    # column; 0 or less means the whole column is always scanned
+    FAST_PATH_ROWS = 50
+    
     def __init__(self):
         """Initialize Google Sheets client with credentials."""
         try:
             # Set up credentials
             scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-            self.creds = ServiceAccountCredentials.from_json_keyfile_name("credenciales.json", scopes=scope)
-            self.client = gspread.authorize(self.creds)
+            self.creds = Credentials.from_service_account_file("credenciales.json", scopes=scope)
+            
+            # Pooled session so every request reuses open connections
+            session = AuthorizedSession(self.creds)
+            session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+            self.client = gspread.Client(auth=self.creds, session=session)
              
             # Open the spreadsheet using the key from environment variables
             spreadsheet_key = os.getenv("KEY_SHEET")
             self.spreadsheet = self.client.open_by_key(spreadsheet_key)
             
+            # Header rows rarely change during a run, so they are cached per worksheet
+            self._header_cache: Dict[int, List[str]] = {}
+            self._header_index: Dict[int, Dict[str, int]] = {}
+            self._col_cache: Dict[Tuple[int, Tuple[str, ...]], int] = {}
+            
+            # Full worksheet reads (worksheet id -> (read time, rows)), dropped on every write
+            self._sheet_cache: Dict[int, Tuple[float, List[List[str]]]] = {}
+            # Seconds a full worksheet read is reused before it is fetched again
+            self._sheet_cache_ttl = float(os.getenv("SHEET_CACHE_TTL", "60"))
+            
             logger.info("Google Sheets service initialized successfully")
             
         except Exception as e:
@@ -53,107 +114,338 @@ class SheetService:
             logger.error(f"Failed to get worksheet '{worksheet_name}': {str(e)}")
             raise ValueError(f"Worksheet '{worksheet_name}' not found")
     
+    def _snapshot(self, worksheet: gspread.worksheet.Worksheet) -> List[List[str]]:
+        """Get all values of a worksheet, reusing a recent read when possible.
+        
+        Snapshots expire after SHEET_CACHE_TTL (env) seconds and are dropped by every
+        write made through this service. Callers must not modify the rows.
+        
+        Args:
+            worksheet: The worksheet to read
+            
+        Returns:
+            All rows of the worksheet, header row included
+        """
+        rows = self._cached_snapshot(worksheet)
+        if rows is not None:
+            return rows
+        
+        read_at = time.monotonic()
+        rows = worksheet.get_all_values()
+        self._sheet_cache[worksheet.id] = (read_at, rows)
+        return rows
+    
+    def _cached_snapshot(self, worksheet: gspread.worksheet.Worksheet) -> Optional[List[List[str]]]:
+        """Get the worksheet snapshot only if a fresh one is already cached.
+        
+        Args:
+            worksheet: The worksheet to look up
+            
+        Returns:
+            All rows of the worksheet, or None if it would have to be read
+        """
+        cached = self._sheet_cache.get(worksheet.id)
+        if cached is not None and time.monotonic() - cached[0] < self._sheet_cache_ttl:
+            return cached[1]
+        return None
+    
+    def _values_batch_get(self, ranges: List[str]) -> List[List[List[str]]]:
+        """Read several A1 ranges of the spreadsheet in a single values.batchGet call.
+        
+        Args:
+            ranges: A1 ranges, e.g. "'ANIMAL'" for a whole worksheet
+            
+        Returns:
+            The rows of each range, in the order given, padded to equal width
+        """
+        response = self.spreadsheet.values_batch_get(ranges)
+        results = []
+        for value_range in response.get("valueRanges", []):
+            rows = value_range.get("values", [])
+            # Match get_all_values, which pads short rows with empty strings
+            width = max((len(row) for row in rows), default=0)
+            results.append([row + [""] * (width - len(row)) for row in rows])
+        return results
+    
+    def prefetch(self, worksheets: List[gspread.worksheet.Worksheet]) -> None:
+        """Load the snapshots of several worksheets in one request.
+        
+        Later reads on these worksheets are served from the snapshot cache. On
+        failure each worksheet is simply read on first use, as without prefetch.
+        
+        Args:
+            worksheets: Worksheets about to be read
+        """
+        try:
+            ranges = ["'{}'".format(ws.title.replace("'", "''")) for ws in worksheets]
+            read_at = time.monotonic()
+            for worksheet, rows in zip(worksheets, self._values_batch_get(ranges)):
+                self._sheet_cache[worksheet.id] = (read_at, rows)
+        except Exception as e:
+            logger.error(f"Failed to prefetch worksheets: {str(e)}")
+    
+    def _invalidate(self, worksheet: gspread.worksheet.Worksheet) -> None:
+        """Drop the cached snapshot of a worksheet after writing to it.
+        
+        Args:
+            worksheet: The worksheet that was modified
+        """
+        self._sheet_cache.pop(worksheet.id, None)
+    
+    def _column_values(self, worksheet: gspread.worksheet.Worksheet, col_idx: int) -> List[str]:
+        """Get one column from the worksheet snapshot.
+        
+        Args:
+            worksheet: The worksheet to read
+            col_idx: Column index (1-based)
+            
+        Returns:
+            The column values, starting at row 1
+        """
+        return [row[col_idx - 1] if len(row) >= col_idx else "" for row in self._snapshot(worksheet)]
+    
     def get_headers(self, worksheet: gspread.worksheet.Worksheet) -> List[str]:
         """Get the header row from a worksheet.
         
+        The row is taken from the worksheet snapshot when one is already cached,
+        otherwise only the first row is read, and is then served from cache.
+        
         Args:
             worksheet: The worksheet to get headers from
             
         Returns:
             List of column headers
         """
-        try:
-            return worksheet.row_values(1)
-        except Exception as e:
-            logger.error(f"Failed to get headers: {str(e)}")
+        headers = self._header_cache.get(worksheet.id)
+        if headers is None:
+            try:
+                rows = self._cached_snapshot(worksheet)
+                if rows is None:
+                    headers = worksheet.row_values(1)
+                else:
+                    headers = list(rows[0]) if rows else []
+                    # Drop the padding added when data rows are wider than the header
+                    while headers and not headers[-1]:
+                        headers.pop()
+            except Exception as e:
+                logger.error(f"Failed to get headers: {str(e)}")
+                return []
+            self._store_headers(worksheet, headers)
+        return headers
+    
+    def get_header_index(self, worksheet: gspread.worksheet.Worksheet) -> Dict[str, int]:
+        """Get a header -> 0-based column position map for a worksheet.
+        
+        Args:
+            worksheet: The worksheet to get headers from
+            
+        Returns:
+            Dictionary mapping each header to its first column position
+        """
+        self.get_headers(worksheet)
+        return self._header_index.get(worksheet.id, {})
+    
+    def get_column_values(self, worksheet: gspread.worksheet.Worksheet, column_name: str) -> List[str]:
+        """Get the values of a column by header name from the worksheet snapshot.
+        
+        Args:
+            worksheet: The worksheet to read
+            column_name: Exact header of the column
+            
+        Returns:
+            The values below the header row, or an empty list if there is no such column
+        """
+        col_idx = self.get_header_index(worksheet).get(column_name)
+        if col_idx is None:
             return []
+        return self._column_values(worksheet, col_idx + 1)[1:]
+    
+    def invalidate_headers(self, worksheet: gspread.worksheet.Worksheet) -> None:
+        """Drop the cached headers of a worksheet after its header row changes.
+        
+        Args:
+            worksheet: The worksheet whose header row was modified
+        """
+        self._header_cache.pop(worksheet.id, None)
+        self._header_index.pop(worksheet.id, None)
+        for key in [key for key in self._col_cache if key[0] == worksheet.id]:
+            del self._col_cache[key]
     
-    def get_oldest_date(self, worksheet: gspread.worksheet.Worksheet) -> datetime:
+    def _store_headers(self, worksheet: gspread.worksheet.Worksheet, headers: List[str]) -> None:
+        """Cache a worksheet's headers and their column positions."""
+        index = {}
+        for col_idx, header in enumerate(headers):
+            index.setdefault(header, col_idx)
+        self._header_cache[worksheet.id] = headers
+        self._header_index[worksheet.id] = index
+    
+    def _resolve_col(self, worksheet: gspread.worksheet.Worksheet, candidates: Tuple[str, ...]) -> int:
+        """Find the first column whose header matches one of the candidates.
+        
+        The result is cached per worksheet until its headers are invalidated.
+        
+        Args:
+            worksheet: The worksheet to search in
+            candidates: Accepted lowercase header names
+            
+        Returns:
+            Column index (1-based) or -1 if no header matches
+        """
+        key = (worksheet.id, candidates)
+        col_idx = self._col_cache.get(key)
+        if col_idx is None:
+            headers = self.get_headers(worksheet)
+            col_idx = next((i + 1 for i, h in enumerate(headers) if h.lower() in candidates), -1)
+            if headers:
+                self._col_cache[key] = col_idx
+        return col_idx
+    
+    def get_oldest_date(self, worksheet: gspread.worksheet.Worksheet, fast_path: Optional[bool] = None) -> datetime:
         """Get the oldest date in the spreadsheet for comparison.
         
+        With the fast path the last date among the last FAST_PATH_ROWS rows is
+        taken; the whole column is scanned for the newest date otherwise, or
+        when none of those rows holds a date.
+        
         Args:
             worksheet: The worksheet to search in
+            fast_path: Take the last date instead of scanning the whole column
+                (defaults to DATES_APPEND_ONLY)
             
         Returns:
             The oldest date found or a default date (2020-01-01)
         """
         try:
-            headers = self.get_headers(worksheet)
-            
-            # Find the date column index
-            date_column_index = -1
-            for idx, header in enumerate(headers):
-                if header.lower() in ["fecha", "date"]:
-                    date_column_index = idx + 1
-                    break
-            
+            date_column_index = self._resolve_col(worksheet, ("fecha", "date"))
             if date_column_index == -1:
                 logger.warning("Date column not found in worksheet")
                 return datetime(2020, 1, 1, 0, 0, 0)
             
             # Get all date values (excluding header)
-            date_values = worksheet.col_values(date_column_index)[1:]
-            
-            # Convert to datetime objects
-            dates = []
-            for date_str in date_values:
-                if date_str.strip():
-                    try:
-                        # Handle different date formats
-                        if "/" in date_str:
-                            dt = datetime.strptime(date_str, "%d/%m/%Y %H:%M:%S")
-                            
-                        else:
-                            dt = datetime.strptime(date_str, "%d/%m/%Y %H:%M:%S")
-                        dates.append(dt)
-                    except ValueError:
-                        logger.warning(f"Could not parse date: {date_str}")
-            
-            if dates:
-                return max(dates)
-            else:
-                return datetime(2020, 1, 1, 0, 0, 0)
+            date_values = self._column_values(worksheet, date_column_index)[1:]
+            
+            if fast_path is None:
+                fast_path = self.DATES_APPEND_ONLY
+            if fast_path and self.FAST_PATH_ROWS > 0:
+                for date_str in reversed(date_values[-self.FAST_PATH_ROWS:]):
+                    newest = self._newest_date([date_str])
+                    if newest is not None:
+                        return newest
+                logger.debug("No date in the last rows, scanning the whole column")
+            
+            return self._newest_date(date_values) or datetime(2020, 1, 1, 0, 0, 0)
                 
         except Exception as e:
             logger.error(f"Error finding oldest date: {str(e)}")
             return datetime(2020, 1, 1, 0, 0, 0)
     
-    def find_row_by_id(self, worksheet: gspread.worksheet.Worksheet, id: int) -> int:
-        """Find a row by name in the worksheet.
+    def _newest_date(self, date_values: List[str]) -> Optional[datetime]:
+        """Find the newest date among sheet date strings.
+        
+        Each value is matched once against _DATE_RE and compared as a
+        yyyymmddHHMMSS integer; a datetime is only built for a new maximum,
+        which also rejects impossible dates such as 31/02.
         
         Args:
-            worksheet: The worksheet to search in
-            name: Name to search for
+            date_values: Date strings of the column, header excluded
             
         Returns:
-            Row index (1-based) or -1 if not found
+            The newest date or None if no value could be parsed
         """
-        try:
-            headers = self.get_headers(worksheet)
-            
-            # Find the name column index
-            name_col_index = -1
-            for idx, header in enumerate(headers):
-                if header.lower() == "id":
-                    name_col_index = idx + 1
-                    break
+        newest = None
+        newest_key = 0
+        for date_str in date_values:
+            date_str = date_str.strip()
+            if not date_str:
+                continue
+            key = _date_key(date_str)
+            if key is None:
+                logger.warning(f"Could not parse date: {date_str}")
+                continue
+            if key > newest_key:
+                try:
+                    newest = _key_to_datetime(key)
+                except ValueError:
+                    logger.warning(f"Could not parse date: {date_str}")
+                    continue
+                newest_key = key
+        return newest
+    
+    def _index_column(self, values: List[str]) -> Dict[str, int]:
+        """Map each normalized cell value to the first 1-based row holding it.
+        
+        Args:
+            values: Column values, starting at row 1
             
-            if name_col_index == -1:
-                logger.warning("Name column not found in worksheet")
-                return -1
+        Returns:
+            Dictionary of stripped, lowercased value -> row index
+        """
+        index = {}
+        for row_idx, value in enumerate(values, start=1):
+            key = value.strip().lower()
+            if key:
+                index.setdefault(key, row_idx)
+        return index
+    
+    def _build_column_index(self, worksheet: gspread.worksheet.Worksheet, column_names: tuple) -> Dict[str, int]:
+        """Build a value -> row index for the first column matching column_names.
+        
+        Args:
+            worksheet: The worksheet to index
+            column_names: Accepted lowercase header names for the column
             
-            # Get all name values
-            name_values = worksheet.col_values(name_col_index)
+        Returns:
+            The column index, empty if the column is not found
+        """
+        col_idx = self._resolve_col(worksheet, column_names)
+        if col_idx == -1:
+            logger.warning(f"Column {column_names} not found in worksheet")
+            return {}
+        return self._index_column(self._column_values(worksheet, col_idx))
+    
+    def _build_name_index(self, worksheet: gspread.worksheet.Worksheet) -> Dict[str, int]:
+        """Build a name -> row index with a single column read.
+        
+        Args:
+            worksheet: The worksheet to index
             
-            # Find the matching row (case-insensitive)
-            for row_idx, cell_value in enumerate(name_values):
-                if cell_value== id:
-                    return row_idx + 1  # Convert to 1-based indexing
+        Returns:
+            Dictionary of lowercased name -> row index (1-based)
+        """
+        return self._build_column_index(worksheet, ("nombre", "name"))
+    
+    def find_row_by_name(self, worksheet: gspread.worksheet.Worksheet, name: str) -> int:
+        """Find a row by name in the worksheet (case-insensitive).
+        
+        For many lookups, build the index once with _build_name_index instead.
+        
+        Args:
+            worksheet: The worksheet to search in
+            name: Name to search for
             
-            return -1  # Not found
+        Returns:
+            Row index (1-based) or -1 if not found
+        """
+        try:
+            return self._build_name_index(worksheet).get(name.strip().lower(), -1)
+        except Exception as e:
+            logger.error("Error finding row by name '%s': %s", name, e)
+            return -1
+    
+    def find_row_by_id(self, worksheet: gspread.worksheet.Worksheet, id: int) -> int:
+        """Find a row by id in the worksheet.
+        
+        Args:
+            worksheet: The worksheet to search in
+            id: Id to search for
             
+        Returns:
+            Row index (1-based) or -1 if not found
+        """
+        try:
+            return self._build_column_index(worksheet, ("id",)).get(str(id).strip().lower(), -1)
         except Exception as e:
-            logger.error(f"Error finding row by name '{id}': {str(e)}")
+            logger.error(f"Error finding row by id '{id}': {str(e)}")
             return -1
         
         
@@ -167,21 +459,13 @@ class SheetService:
             The oldest id found or a default 1
         """
         try:
-            headers = self.get_headers(worksheet)
-            
-            # Find the date column index
-            id_column_index = -1
-            for idx, header in enumerate(headers):
-                if header.lower() =="id" :
-                    id_column_index = idx + 1
-                    break
-            
+            id_column_index = self._resolve_col(worksheet, ("id",))
             if id_column_index == -1:
                 logger.warning("Id column not found in worksheet")
                 return 1
             
             # Get all date values (excluding header)
-            id_values = worksheet.col_values(id_column_index)[1:]
+            id_values = self._column_values(worksheet, id_column_index)[1:]
             
 
             id_numbers = [int(val) for val in id_values if val.strip().isdigit()]
@@ -208,25 +492,21 @@ class SheetService:
         Returns:
             True if successful, False otherwise
         """
-        # Handle list of dictionaries
-        if isinstance(data, list):
-            success = True
-            for item in data:
-                if not self.insert_sheet_from_dict(item, worksheet):
-                    success = False
-            return success
+        # A list is written with a single append instead of one call per item
+        items = data if isinstance(data, list) else [data]
+        if not items:
+            return True
         
         try:
             headers = self.get_headers(worksheet)
             logger.info(f"Creating new entry for {data}")
                 
-                # Create a list with values in the correct order
-            new_row = []
-            for header in headers: 
-                new_row.append(data.get(header, ""))
+                # Create lists with values in the correct order
+            new_rows = [[item.get(header, "") for header in headers] for item in items]
                 
-                # Append the new row
-            worksheet.append_row(new_row)
+                # Append the new rows
+            worksheet.append_rows(new_rows)
+            self._invalidate(worksheet)
             print("insertado ")
             return True
             
@@ -234,12 +514,117 @@ class SheetService:
             logger.error(f"Error updating sheet: {str(e)}")
             return False
 
+    def update_sheet_from_dict(self, data: Union[Dict[str, Any], List[Dict[str, Any]]], worksheet: gspread.worksheet.Worksheet) -> bool:
+        """Update the rows matching each item's "Nombre", appending unknown names.
+        
+        Existing cells are only overwritten by longer values, so a partial
+        update never erases richer data. The sheet is read once and all changes
+        go out in one batch update plus one append, whatever the number of items.
+        
+        Args:
+            data: Dictionary with data to update or list of dictionaries
+            worksheet: The worksheet to update
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        items = data if isinstance(data, list) else [data]
+        
+        # Drop items without a name and merge repeats of a name before touching
+        # the sheet, keeping the longest value of each field
+        merged = {}
+        for item in items:
+            name = str(item.get("Nombre", "")).strip()
+            if not name:
+                logger.warning("Skipping entry without name: %s", item)
+                continue
+            current = merged.get(name.lower())
+            if current is None:
+                merged[name.lower()] = dict(item)
+                continue
+            for key, value in item.items():
+                if len(str(value)) > len(str(current.get(key, ""))):
+                    current[key] = value
+        if not merged:
+            return True
+        
+        try:
+            rows = self._snapshot(worksheet)
+            if not rows:
+                logger.warning("Worksheet has no header row")
+                return False
+            headers = self.get_headers(worksheet)
+            header_index = self.get_header_index(worksheet)
+            
+            # Find the name column index
+            name_col = self._resolve_col(worksheet, ("nombre", "name")) - 1
+            if name_col < 0:
+                logger.warning("Name column not found in worksheet")
+                return False
+            
+            # Map every name to its 1-based row number in a single pass
+            name_rows = self._index_column([row[name_col] if len(row) > name_col else "" for row in rows])
+            col_letters = [_col_letter(i + 1) for i in range(len(headers))]
+            
+            cell_updates = []
+            new_rows = []
+            suppressed = 0
+            
+            for key_name, item in merged.items():
+                name = str(item["Nombre"]).strip()
+                row_idx = name_rows.get(key_name)
+                if row_idx is None:
+                    # New row, prepare in correct order
+                    logger.info("Creating new entry for %s", name)
+                    new_rows.append([item.get(header, "") for header in headers])
+                    continue
+                
+                # Compare against the snapshot; values equal once trimmed are not written
+                current_row = rows[row_idx - 1]
+                row_updates = []
+                for key, value in item.items():
+                    col_idx = header_index.get(key)
+                    if col_idx is None:
+                        continue
+                    current_value = current_row[col_idx].strip() if col_idx < len(current_row) else ""
+                    new_value = str(value).strip()
+                    if new_value == current_value:
+                        suppressed += 1
+                    elif len(new_value) > len(current_value):
+                        row_updates.append({
+                            'range': f"{col_letters[col_idx]}{row_idx}",
+                            'values': [[value]]
+                        })
+                        logger.debug("Updated %s from %r to %r", key, current_value, value)
+                
+                if row_updates:
+                    cell_updates.extend(row_updates)
+                else:
+                    logger.debug("No changes for %s, row left untouched", name)
+            
+            if suppressed:
+                logger.debug("Suppressed %d writes of unchanged values", suppressed)
+            
+            try:
+                if cell_updates:
+                    worksheet.batch_update(cell_updates, value_input_option='USER_ENTERED')
+                if new_rows:
+                    worksheet.append_rows(new_rows, value_input_option='USER_ENTERED')
+            finally:
+                self._invalidate(worksheet)
+            
+            return True
+            
+        except Exception as e:
+            logger.error("Error updating sheet: %s", e)
+            return False
+
     def get_id(self, name: str, worksheet: gspread.worksheet.Worksheet) -> int | None:
         """
         Versión que devuelve None si no encuentra el valor (sin excepciones)
         """
         try:
-            values = worksheet.get_all_values()
+            values = self._snapshot(worksheet)
             if not values:
                 return None
                 
@@ -251,9 +636,11 @@ class SheetService:
             except ValueError:
                 return None
             
+            # Normalize the search key once, not once per row
+            target = name.strip().lower()
             for row in values[1:]:
                 if (len(row) > name_col and 
-                    row[name_col].strip().lower() == name.strip().lower()):
+                    row[name_col].strip().lower() == target):
                     if len(row) > id_col and row[id_col].strip():
                         return row[id_col].strip()
             
@@ -273,54 +660,64 @@ class SheetService:
         Returns:
             True if successful, False otherwise
         """
-        logger.info(f"Actualizando {data}")
+        logger.info("Actualizando %s", data)
+        
+        # Drop items without an ID and merge repeats of an ID before touching
+        # the sheet; later values win, as they would when written in order
+        merged = {}
+        for item in data:
+            key_id = str(item.get("ID", "")).strip().lower()
+            if key_id:
+                merged.setdefault(key_id, {}).update(item)
+        
         try:
-            if not data:
+            if not merged:
                 return True
                 
             # Get headers to ensure data aligns with columns
             headers = self.get_headers(worksheet)
+            header_index = self.get_header_index(worksheet)
+            col_letters = [_col_letter(i + 1) for i in range(len(headers))]
             
-            # Prepare batch update requests
-            batch_requests = []
+            # Index the id column once instead of scanning it per item
+            id_index = self._build_column_index(worksheet, ("id",))
             
-            for item in data:
-                # Skip items without name
-                if "ID" not in item:
-                    continue
-                    
-                id_to_find = item["ID"]
-                row_idx = self.find_row_by_id(worksheet, id_to_find)
+            # Updates to existing cells and brand-new rows go out separately
+            cell_updates = []
+            new_rows = []
+            
+            for key_id, item in merged.items():
+                row_idx = id_index.get(key_id, -1)
                 
                 if row_idx > 1:  # Found existing row
                     # Create update requests for each field
                     for key, value in item.items():
-                        if key in headers:
-                            col_idx = headers.index(key) + 1
-                            batch_requests.append({
-                                'range': f"{gspread.utils.rowcol_to_a1(row_idx, col_idx)}",
-                                'values': [[value]]
-                            })
+                        col_idx = header_index.get(key)
+                        if col_idx is None:
+                            continue
+                        cell_updates.append({
+                            'range': f"{col_letters[col_idx]}{row_idx}",
+                            'values': [[value]]
+                        })
                 else:
                     # New row, prepare in correct order
-                    new_row = []
-                    for header in headers:
-                        new_row.append(item.get(header, ""))
-                    
-                    # Add as append request
-                    batch_requests.append({
-                        'range': f"A{worksheet.row_count + 1}:{gspread.utils.rowcol_to_a1(1, len(headers))}",
-                        'values': [new_row]
-                    })
-            
-            # Execute batch update
-            if batch_requests:
-                worksheet.batch_update(batch_requests)
+                    new_rows.append([item.get(header, "") for header in headers])
+            
+            try:
+                # Execute batch update
+                if cell_updates:
+                    worksheet.batch_update(cell_updates, value_input_option='USER_ENTERED')
+                
+                # Append after the last used row; row_count is the sheet capacity
+                if new_rows:
+                    worksheet.append_rows(new_rows, value_input_option='USER_ENTERED', insert_data_option='INSERT_ROWS')
+            finally:
+                self._invalidate(worksheet)
                 
             return True
             
         except Exception as e:
-            logger.error(f"Error in batch update: {str(e)}")
+            logger.error("Error in batch update: %s", e)
             return False
     
     def buscar_valor_en_fila(self,worksheet, columna_busqueda, columna_retorno, valor_buscado):
@@ -337,21 +734,24 @@ class SheetService:
             str: Valor correspondiente de la columna de retorno o None si no se encuentra.
         """
         try:
-            headers = worksheet.row_values(1)
+            headers = self.get_headers(worksheet)
             
             # Buscar índice de las columnas
-            idx_busqueda = next((i for i, h in enumerate(headers) if h.lower() == columna_busqueda.lower()), -1)
-            idx_retorno = next((i for i, h in enumerate(headers) if h.lower() == columna_retorno.lower()), -1)
+            busqueda = columna_busqueda.lower()
+            retorno = columna_retorno.lower()
+            idx_busqueda = next((i for i, h in enumerate(headers) if h.lower() == busqueda), -1)
+            idx_retorno = next((i for i, h in enumerate(headers) if h.lower() == retorno), -1)
             
             if idx_busqueda == -1 or idx_retorno == -1:
                 print("No se encontraron las columnas indicadas.")
                 return None
             
             # Obtener todas las filas (excluyendo encabezados)
-            filas = worksheet.get_all_values()[1:]
+            filas = self._snapshot(worksheet)[1:]
             
+            valor = str(valor_buscado)
             for fila in filas:
-                if len(fila) > idx_busqueda and str(fila[idx_busqueda]).strip() == str(valor_buscado):
+                if len(fila) > idx_busqueda and fila[idx_busqueda].strip() == valor:
                     if len(fila) > idx_retorno:
                         return fila[idx_retorno]
                     else:
@@ -2,14 +2,16 @@ import os
 import re
 import logging
 import pandas as pd
-import pdfplumber
-import glob
+import fitz
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import numpy as np
-from typing import List, Dict, Any, Optional
+import xlsxwriter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
+from utils.helpers import ensure_directory_exists, load_json_from_file, save_json_to_file
 
 # Configure logging
 logging.basicConfig(
@@ -22,6 +24,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger("TransactionProcessor")
 
+# Statement line patterns, compiled once for every line of every PDF
+_TRANSFER_PATTERNS = [
+    # Primary pattern
+    re.compile(r'(\d{2}-\d{2}-\d{4})\s+(Transferencia\s+.+?)\s+(\d{9,})\s+\$\s*(-?[\d.,]+)(?:\s+\$\s*[\d.,]+)?'),
+    # Date + description pattern
+    re.compile(r'(\d{2}-\d{2}-\d{4})\s+(Transferencia\s+.+?)(?:\s{2,}|\d{9,}|$)'),
+    # Description-only pattern
+    re.compile(r'(Transferencia\s+.+?)$')
+]
+
+_PAYMENT_PATTERNS = [
+    # Primary payment pattern
+    re.compile(r'(\d{2}-\d{2}-\d{4})\s+(Pago\s+.+?)\s+(\d{9,})\s+\$\s*(-?[\d.,]+)(?:\s+\$\s*[\d.,]+)?')
+]
+
+_ID_RE = re.compile(r'(\d{9,})')
+_VAL_RE = re.compile(r'\$\s*(-?[\d.,]+)')
+_TRANSFER_DESC_RE = re.compile(r'(Transferencia\s+.+?)$')
+_DATE_ID_VAL_RE = re.compile(r'(\d{2}-\d{2}-\d{4})\s+(\d{9,})\s+\$\s*(-?[\d.,]+)')
+_DATE_START_RE = re.compile(r'^\d{2}-\d{2}-\d{4}')
+
+# Statement amounts use '.' for thousands and ',' for decimals (1.234,50)
+_TRANS = str.maketrans({'.': None, ',': '.'})
+
+# Words whose tops differ by at most this many points share a text line
+_LINE_Y_TOLERANCE = 3
+
+# Complete single-line entry of either kind; [^\S\n] keeps every match inside one line
+_PAGE_RE = re.compile(
+    r'(?P<date>\d{2}-\d{2}-\d{4})[^\S\n]+'
+    r'(?P<desc>(?P<kind>Transferencia|Pago)[^\S\n]+[^\n]+?)[^\S\n]+'
+    r'(?P<opid>\d{9,})[^\S\n]+\$[^\S\n]*(?P<val>-?[\d.,]+)'
+)
+
 # Configuration
 @dataclass
 class Config:
@@ -31,6 +67,15 @@ class Config:
     OUTPUT_FOLDER = r"C:\Users\guisell.lara\Documents\cargarExcelxvoz"
     CREDENTIALS_FILE = "credenciales.json"
     
+    # Extractions of already parsed PDFs, keyed by file name, mtime and size
+    PDF_CACHE_FOLDER = os.path.join(OUTPUT_FOLDER, "pdf_cache")
+    
+    # Parquet copies of already parsed Excel files, reused while the workbook is unchanged
+    EXCEL_CACHE_FOLDER = os.path.join(OUTPUT_FOLDER, "excel_cache")
+    
+    # Excel reader; calamine (pandas >= 2.2 with python-calamine) is much faster than openpyxl
+    EXCEL_ENGINE = "calamine"
+    
     # Google Sheet settings
     SPREADSHEET_ID = "1UvIvxfEejGRBb7Cc_WWyYlQF7s0k__E29omKMv_ebpE"
     WORKSHEET_NAME = "Transaccion donaciones"
@@ -69,23 +114,48 @@ class Config:
     }
 
 
+# Excluded names normalized once, so spelling case no longer matters
+_EXCLUDED_UPPER = frozenset(name.upper() for name in Config.EXCLUDED_NAMES)
+
+# Only the mapped columns are read from the Mercado Pago workbooks
+_MAPPED_COLUMNS_UPPER = frozenset(key.upper() for key in Config.MAPPING_COLUMNS)
+
+def _is_mapped_column(col) -> bool:
+    """Whether a workbook column is one of the MAPPING_COLUMNS (case-insensitive)."""
+    return str(col).upper() in _MAPPED_COLUMNS_UPPER
+
+def _list_files(folder: str, extensions: tuple) -> List[str]:
+    """List the files of a folder with the given extensions in one directory scan.
+    
+    Extensions match case-insensitively; Office lock files (~$name) are skipped.
+    """
+    if not os.path.isdir(folder):
+        return []
+    with os.scandir(folder) as entries:
+        return sorted(
+            entry.path for entry in entries
+            if entry.is_file() and entry.name.lower().endswith(extensions) and not entry.name.startswith('~$')
+        )
+
+# Expense classification patterns, matched against uppercased provider names
+_EXPENSE_RE = re.compile('|'.join(map(re.escape, Config.EXPENSE_KEYWORDS)))
+_VET_RE = re.compile(r'\b(?:WALTER EDUARDO PEREZ|VETERINAR|LINARES, MARCELO)\b')
+_CABIFY_RE = re.compile(r'\bCABIFY\b')
+
+# Drops the first matching label from the start of a description and trims the rest
+_DESCRIPTION_PREFIX_RE = re.compile(
+    r'^(?:Transferencia recibida|Transferencia enviada|Transferencia|Pago)\s*(.*?)\s*\Z', re.DOTALL)
+
+
 class PDFExtractor:
     """Class to extract financial transactions from PDF files."""
     
+    # Part of the extraction cache key; bump it whenever the extracted output changes
+    VERSION = 1
+    
     def __init__(self):
-        self.transfer_patterns = [
-            # Primary pattern
-            r'(\d{2}-\d{2}-\d{4})\s+(Transferencia\s+.+?)\s+(\d{9,})\s+\$\s*(-?[\d.,]+)(?:\s+\$\s*[\d.,]+)?',
-            # Date + description pattern
-            r'(\d{2}-\d{2}-\d{4})\s+(Transferencia\s+.+?)(?:\s{2,}|\d{9,}|$)',
-            # Description-only pattern
-            r'(Transferencia\s+.+?)$'
-        ]
-        
-        self.payment_patterns = [
-            # Primary payment pattern
-            r'(\d{2}-\d{2}-\d{4})\s+(Pago\s+.+?)\s+(\d{9,})\s+\$\s*(-?[\d.,]+)(?:\s+\$\s*[\d.,]+)?'
-        ]
+        self.transfer_patterns = _TRANSFER_PATTERNS
+        self.payment_patterns = _PAYMENT_PATTERNS
         
         self.payment_keywords = ['Balanceados', 'Pet', 'Poppi', 'VETERINARIA', 'CABIFY']
     
@@ -95,41 +165,104 @@ class PDFExtractor:
         transactions = []
         
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages, 1):
+            with fitz.open(pdf_path) as doc:
+                for page_num, page in enumerate(doc, 1):
                     logger.debug(f"Processing page {page_num}")
-                    text = page.extract_text() or ""
-                    lines = text.split('\n')
-                    
-                    i = 0
-                    while i < len(lines):
-                        line = lines[i]
-                        
-                        # Process transfers
-                        if 'Transferencia' in line:
-                            tx = self._extract_transfer(lines, i)
-                            if tx:
-                                transactions.append(tx)
-                        
-                        # Process payments with keywords
-                        elif 'Pago ' in line and any(kw in line for kw in self.payment_keywords):
-                            tx = self._extract_payment(lines, i)
-                            if tx:
-                                transactions.append(tx)
-                        
-                        i += 1
+                    text = self._page_text(page)
+                    transactions.extend(self._extract_from_text(text))
         except Exception as e:
             logger.error(f"Error extracting from PDF {pdf_path}: {e}")
         
         return transactions
     
+    @staticmethod
+    def _page_text(page) -> str:
+        """Rebuild a page's text one visual row per line.
+        
+        PyMuPDF's plain text puts each table cell on its own line, so words are
+        grouped by vertical position and joined left to right instead, the way
+        the statement patterns expect (and pdfplumber used to return).
+        """
+        words = sorted(page.get_text("words"), key=lambda w: (w[1], w[0]))
+        
+        rows = []
+        row = []
+        row_top = None
+        for x0, top, _, _, word, *_ in words:
+            if row and top - row_top > _LINE_Y_TOLERANCE:
+                rows.append(row)
+                row = []
+            if not row:
+                row_top = top
+            row.append((x0, word))
+        if row:
+            rows.append(row)
+        
+        return '\n'.join(' '.join(word for _, word in sorted(row)) for row in rows)
+    
+    def _extract_from_text(self, text: str) -> List[Dict[str, Any]]:
+        """Extract transactions from the text of one page, in line order."""
+        # Split on '\n' only: line numbers below are counted from '\n' offsets,
+        # which splitlines() would break on other separators such as '\x0c'
+        lines = text.split('\n')
+        
+        # Fast path: complete single-line entries found in one scan of the page
+        found = {}
+        line_no = 0
+        last_pos = 0
+        for match in _PAGE_RE.finditer(text):
+            line_no += text.count('\n', last_pos, match.start())
+            last_pos = match.start()
+            if line_no in found:
+                continue
+            
+            # Payments only count on keyword lines that hold no transfer
+            line = lines[line_no]
+            if match['kind'] == 'Pago' and (
+                'Transferencia' in line or 'Pago ' not in line
+                or not any(kw in line for kw in self.payment_keywords)
+            ):
+                continue
+            
+            try:
+                value = float(match['val'].translate(_TRANS))
+            except ValueError:
+                continue
+            found[line_no] = {
+                'Fecha': match['date'],
+                'Descripción': match['desc'],
+                'ID de la operación': match['opid'],
+                'Valor': value
+            }
+        
+        # Slow path: line-by-line patterns for everything the scan did not cover
+        transactions = []
+        for i, line in enumerate(lines):
+            if i in found:
+                transactions.append(found[i])
+            
+            # Process transfers
+            elif 'Transferencia' in line:
+                tx = self._extract_transfer(lines, i)
+                if tx:
+                    transactions.append(tx)
+            
+            # Process payments with keywords
+            elif 'Pago ' in line and any(kw in line for kw in self.payment_keywords):
+                tx = self._extract_payment(lines, i)
+                if tx:
+                    transactions.append(tx)
+        
+        return transactions
+    
     def _extract_transfer(self, lines: List[str], line_idx: int) -> Optional[Dict[str, Any]]:
         """Extract transfer transaction from lines starting at line_idx."""
         line = lines[line_idx]
+        has_next = line_idx + 1 < len(lines)
         
         # Try primary pattern
         for pattern in self.transfer_patterns:
-            match = re.search(pattern, line)
+            match = pattern.search(line)
             if match and len(match.groups()) >= 3:
                 try:
                     fecha = match.group(1)
@@ -139,18 +272,18 @@ class PDFExtractor:
                     if len(match.groups()) >= 4:
                         op_id = match.group(3)
                         value_str = match.group(4)
-                        value = float(value_str.replace('.', '').replace(',', '.'))
+                        value = float(value_str.translate(_TRANS))
                     else:
                         # Look for ID and value in next line
-                        if line_idx + 1 < len(lines):
+                        if has_next:
                             next_line = lines[line_idx + 1]
-                            id_match = re.search(r'(\d{9,})', next_line)
-                            value_match = re.search(r'\$\s*(-?[\d.,]+)', next_line)
+                            id_match = _ID_RE.search(next_line)
+                            value_match = _VAL_RE.search(next_line)
                             
                             op_id = id_match.group(1) if id_match else "Unknown"
                             if value_match:
                                 value_str = value_match.group(1)
-                                value = float(value_str.replace('.', '').replace(',', '.'))
+                                value = float(value_str.translate(_TRANS))
                             else:
                                 continue
                     
@@ -165,22 +298,22 @@ class PDFExtractor:
                     continue
         
         # Try multi-line extraction (3-line strategy)
-        if line_idx + 1 < len(lines):
-            desc_match = re.search(r'(Transferencia\s+.+?)$', line)
+        if has_next:
+            desc_match = _TRANSFER_DESC_RE.search(line)
             if desc_match:
                 description = desc_match.group(1).strip()
                 next_line = lines[line_idx + 1]
-                parts_match = re.search(r'(\d{2}-\d{2}-\d{4})\s+(\d{9,})\s+\$\s*(-?[\d.,]+)', next_line)
+                parts_match = _DATE_ID_VAL_RE.search(next_line)
                 
                 if parts_match:
                     fecha, op_id, value_str = parts_match.groups()
-                    value = float(value_str.replace('.', '').replace(',', '.'))
+                    value = float(value_str.translate(_TRANS))
                     
                     # Check if description continues on third line
                     if line_idx + 2 < len(lines):
                         third_line = lines[line_idx + 2].strip()
-                        if (not re.match(r'^\d{2}-\d{2}-\d{4}', third_line) and 
-                            not re.search(r'\d{9,}', third_line)):
+                        if (not _DATE_START_RE.match(third_line) and 
+                            not _ID_RE.search(third_line)):
                             description += ' ' + third_line
                     
                     return {
@@ -197,11 +330,11 @@ class PDFExtractor:
         line = lines[line_idx]
         
         for pattern in self.payment_patterns:
-            match = re.search(pattern, line)
+            match = pattern.search(line)
             if match:
                 try:
                     fecha, description, op_id, value_str = match.groups()
-                    value = float(value_str.replace('.', '').replace(',', '.'))
+                    value = float(value_str.translate(_TRANS))
                     
                     return {
                         'Fecha': fecha,
@@ -218,41 +351,29 @@ class PDFExtractor:
 class ExcelProcessor:
     """Class to process and merge Excel files."""
     
+    # Workbooks read at the same time while merging
+    READ_WORKERS = 8
+    
+    def __init__(self, config: Config):
+        self.config = config
+    
     def merge_excel_files(self, excel_folder: str, output_name: str = "transaccion_unificadas.xlsx") -> Optional[str]:
         """Merge all Excel files in the specified folder into a single Excel file."""
         logger.info(f"Merging Excel files from {excel_folder}...")
         
         # Get all Excel files in the folder
-        excel_files = glob.glob(os.path.join(excel_folder, "*.xlsx"))
-        excel_files.extend(glob.glob(os.path.join(excel_folder, "*.xls")))
+        excel_files = _list_files(excel_folder, (".xlsx", ".xls"))
         
         if not excel_files:
             logger.warning("No Excel files found in the specified folder.")
             return None
         
-        # Merge all Excel files
-        combined_df = pd.DataFrame()
-        
-        for excel_file in excel_files:
-            try:
-                # Define data types for specific columns
-                dtypes = {'ID DE OPERACIÓN EN MERCADO PAGO': str}
-                
-                try:
-                    df = pd.read_excel(excel_file, dtype=dtypes)
-                except Exception:
-                    # If that fails, read normally then convert after
-                    df = pd.read_excel(excel_file)
-                    
-                    # Look for ID columns and convert them to string
-                    id_columns = [col for col in df.columns if 'ID' in col.upper() 
-                                 and ('OPERACI' in col.upper() or 'MERCADO' in col.upper())]
-                    for col in id_columns:
-                        df[col] = df[col].astype(str)
-                
-                combined_df = pd.concat([combined_df, df], ignore_index=True)
-            except Exception as e:
-                logger.error(f"Error reading {excel_file}: {e}")
+        # Read the files side by side, then merge them with a single concat
+        ensure_directory_exists(self.config.EXCEL_CACHE_FOLDER)
+        workers = min(self.READ_WORKERS, len(excel_files))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            frames = [df for df in executor.map(self._read_excel, excel_files) if df is not None]
+        combined_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
         
         if combined_df.empty:
             logger.warning("No data found in Excel files.")
@@ -272,24 +393,90 @@ class ExcelProcessor:
         if os.path.isfile(output_path):
             os.remove(output_path)
         
-        # Create an Excel writer with the xlsxwriter engine
-        with pd.ExcelWriter(output_path, engine='xlsxwriter', mode='w') as writer:
-            combined_df.to_excel(writer, index=False, sheet_name='Sheet1')
-            
-            # Get the xlsxwriter workbook and worksheet objects
-            workbook = writer.book
-            worksheet = writer.sheets['Sheet1']
+        # Stream the rows with xlsxwriter in constant_memory mode, so memory
+        # stays flat however many rows were merged
+        workbook = xlsxwriter.Workbook(output_path, {
+            'constant_memory': True,
+            'remove_timezone': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss'
+        })
+        try:
+            worksheet = workbook.add_worksheet('Sheet1')
+            header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
             
             # Create a text format for ID columns
             text_format = workbook.add_format({'num_format': '@'})
             
-            # Apply text format to ID columns
+            # Apply text format to ID columns; this must come before any row
+            # is written, because constant_memory flushes rows as it goes
             for col_idx, col_name in enumerate(combined_df.columns):
                 if 'ID' in col_name.upper() and ('OPERACI' in col_name.upper() or 'MERCADO' in col_name.upper()):
                     worksheet.set_column(col_idx, col_idx, None, text_format)
+            
+            worksheet.write_row(0, 0, [str(col) for col in combined_df.columns], header_format)
+            for row_idx, row in enumerate(combined_df.itertuples(index=False, name=None), start=1):
+                # Missing values become empty cells, as with to_excel
+                worksheet.write_row(row_idx, 0, [None if pd.isna(value) else value for value in row])
+        finally:
+            workbook.close()
         
         logger.info(f"Merged {len(excel_files)} Excel files with {len(combined_df)} rows to {output_path}")
         return output_path
+    
+    def _read_excel(self, excel_file: str) -> Optional[pd.DataFrame]:
+        """Read one Excel file with its ID columns as text, or None if it cannot be read.
+        
+        Workbooks read with their ID column as text are also saved as a parquet
+        copy in EXCEL_CACHE_FOLDER, which later runs load instead of parsing
+        the workbook again for as long as it is unchanged.
+        """
+        sidecar = os.path.join(self.config.EXCEL_CACHE_FOLDER, os.path.basename(excel_file) + ".parquet")
+        if os.path.isfile(sidecar) and os.path.getmtime(sidecar) >= os.path.getmtime(excel_file):
+            try:
+                return pd.read_parquet(sidecar)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cache {sidecar}: {e}")
+        
+        df, cacheable = self._parse_excel(excel_file)
+        if df is not None and cacheable:
+            try:
+                df.to_parquet(sidecar, index=False)
+            except Exception as e:
+                logger.debug(f"Could not cache {excel_file} as parquet: {e}")
+        return df
+    
+    def _parse_excel(self, excel_file: str) -> Tuple[Optional[pd.DataFrame], bool]:
+        """Parse one Excel workbook with its ID columns as text.
+        
+        Returns:
+            The data (None if it cannot be read) and whether the ID column was
+            read as text, i.e. whether the result is fit to cache
+        """
+        try:
+            # Define data types for specific columns
+            dtypes = {'ID DE OPERACIÓN EN MERCADO PAGO': str}
+            
+            # The configured engine may be missing (calamine needs python-calamine),
+            # so the default engine is tried before giving up on the dtype
+            for engine in dict.fromkeys((self.config.EXCEL_ENGINE, None)):
+                try:
+                    return pd.read_excel(excel_file, dtype=dtypes, usecols=_is_mapped_column,
+                                         engine=engine), True
+                except Exception as e:
+                    logger.debug(f"Could not read {excel_file} with engine {engine}: {e}")
+            
+            # If that fails, read normally then convert after
+            df = pd.read_excel(excel_file, usecols=_is_mapped_column)
+            
+            # Look for ID columns and convert them to string
+            id_columns = [col for col in df.columns if 'ID' in col.upper() 
+                         and ('OPERACI' in col.upper() or 'MERCADO' in col.upper())]
+            for col in id_columns:
+                df[col] = df[col].astype(str)
+            return df, False
+        except Exception as e:
+            logger.error(f"Error reading {excel_file}: {e}")
+            return None, False
 
 
 class DataCombiner:
@@ -298,17 +485,6 @@ class DataCombiner:
     def __init__(self, config: Config):
         self.config = config
     
-    def clean_description(self, description):
-        """Clean transaction descriptions."""
-        if not isinstance(description, str):
-            return description
-            
-        prefixes = ("Transferencia recibida", "Transferencia enviada", "Transferencia", "Pago")
-        for prefix in prefixes:
-            if description.startswith(prefix):
-                return description[len(prefix):].strip()
-        return description
-    
     def create_final_excel(self, pdf_extracts_path: str, unified_excel_path: str) -> str:
         """Create final Excel files by combining PDF extracts and unified Excel data."""
         logger.info("Creating final Excel files...")
@@ -317,34 +493,41 @@ class DataCombiner:
         pdf_data = pd.read_excel(pdf_extracts_path)
         unified_data = pd.read_excel(unified_excel_path)
         
+        # An all-empty column is read as float, which the .str accessor rejects
+        pdf_data['Descripción'] = pdf_data['Descripción'].astype(object)
+        
         # Remove cancelled transfers
         pdf_data = pdf_data[~pdf_data['Descripción'].str.contains('Transferencia cancelada', 
                                                                case=False, na=False)]
         
-        # Clean descriptions
-        pdf_data['Descripción'] = pdf_data['Descripción'].apply(self.clean_description)
+        # Clean descriptions; cells that are not text are left as they are
+        descripcion = pdf_data['Descripción']
+        is_text = descripcion.map(lambda value: isinstance(value, str)).astype(bool)
+        pdf_data['Descripción'] = descripcion.mask(
+            is_text, descripcion[is_text].str.replace(_DESCRIPTION_PREFIX_RE, r'\1', regex=True))
         
         # Normalize data types
         pdf_data['ID de la operación'] = pdf_data['ID de la operación'].astype(str)
         unified_data["ID DE OPERACIÓN EN MERCADO PAGO"] = unified_data["ID DE OPERACIÓN EN MERCADO PAGO"].astype(str)
         
         # Map column names between dataframes
-        cols_map = {}
-        for key, val in self.config.MAPPING_COLUMNS.items():
-            for col in unified_data.columns:
-                if col.upper() == key:
-                    cols_map[key] = col
-                    break
+        # Index the uppercased columns once, keeping the first of any duplicates
+        col_by_upper = {}
+        for col in unified_data.columns:
+            col_by_upper.setdefault(col.upper(), col)
+        cols_map = {key: col_by_upper[key] for key in self.config.MAPPING_COLUMNS if key in col_by_upper}
         
         # Build final dataset
-        final_rows = self._build_combined_data(pdf_data, unified_data, cols_map)
-        df = pd.DataFrame(final_rows)
+        df = self._build_combined_data(pdf_data, unified_data, cols_map)
         
-        # Add DONANTE column
-        df['DONANTE'] = df['Descripción'].where(df['Descripción'].str.strip() != "", df['PAGADOR'])
+        # Add DONANTE column: the description, or the payer when it is blank
+        desc = df['Descripción'].fillna('').to_numpy()
+        has_desc = np.char.str_len(np.char.strip(desc.astype(str))) > 0
+        df['DONANTE'] = np.where(has_desc, desc, df['PAGADOR'].to_numpy())
         
         # Exclude unwanted names
-        df = df[~df['DONANTE'].isin(self.config.EXCLUDED_NAMES)]
+        donante_upper = df['DONANTE'].str.upper()
+        df = df[~donante_upper.isin(_EXCLUDED_UPPER)]
         
         # Select final columns
         df_final = df[[
@@ -368,7 +551,7 @@ class DataCombiner:
         df_negativos['VALOR'] = df_negativos['VALOR'].abs()
         
         # Process expense data
-        expenses_df = self._process_expenses(df_negativos)
+        expenses_df = self._process_expenses(df_negativos, donante_upper)
         
         # Save expenses to Excel
         negativos_path = os.path.join(self.config.OUTPUT_FOLDER, "transacciones_negativas.xlsx")
@@ -380,55 +563,70 @@ class DataCombiner:
         return negativos_path, df_positivos
     
     def _build_combined_data(self, pdf_data, unified_data, cols_map):
-        """Build combined dataset from PDF and Excel data."""
-        final_rows = []
+        """Build combined dataset from PDF and Excel data with a single left merge."""
+        id_col = "ID DE OPERACIÓN EN MERCADO PAGO"
+        
+        # Keep the first Excel row per operation, under the canonical column names
+        renames = {col: key for key, col in cols_map.items() if key != id_col}
+        uni = unified_data[[id_col, *renames]].rename(columns=renames).drop_duplicates(id_col)
+        merged = pdf_data.merge(uni, left_on='ID de la operación', right_on=id_col, how='left')
+        for key in self.config.MAPPING_COLUMNS:
+            if key not in merged.columns:
+                merged[key] = np.nan
+        
+        # Get date from best source: the Excel origin date, else the PDF date
+        origin = merged['FECHA DE ORIGEN']
+        fecha = self._format_dates(origin).where(
+            origin.notna(), self._format_dates(merged['Fecha'], format='%d-%m-%Y'))
+        
+        return pd.DataFrame({
+            'ID DE LA OPERACION': merged['ID de la operación'],
+            'FECHA': fecha,
+            'MEDIO DE PAGO': merged['MEDIO DE PAGO'],
+            'TIPO DE IDENTIFICACIÓN DEL PAGADOR': merged['TIPO DE IDENTIFICACIÓN DEL PAGADOR'],
+            'NÚMERO DE IDENTIFICACIÓN DEL PAGADOR': merged['NÚMERO DE IDENTIFICACIÓN DEL PAGADOR'],
+            'PAGADOR': merged['PAGADOR'],
+            'DETALLE DE LA VENTA': merged['DETALLE DE LA VENTA'],
+            'Descripción': merged['Descripción'],
+            'VALOR': merged['Valor']
+        })
+    
+    @staticmethod
+    def _format_dates(values, format="mixed"):
+        """Format a column of dates as dd/mm/YYYY HH:MM:SS, empty where unparseable.
+        
+        With the default format='mixed' every value is parsed with its own
+        format, so origin dates written differently don't blank each other.
+        """
+        try:
+            parsed = pd.to_datetime(values, errors="coerce", format=format)
+        except ValueError:
+            # Values with different UTC offsets can't share one column; parse
+            # each on its own so it keeps its own offset
+            parsed = values.map(lambda value: pd.to_datetime(value, errors="coerce", format=format))
+        if not pd.api.types.is_datetime64_any_dtype(parsed):
+            return parsed.map(lambda ts: "" if pd.isna(ts) else ts.strftime("%d/%m/%Y %H:%M:%S"))
+        return parsed.dt.strftime("%d/%m/%Y %H:%M:%S").fillna("")
+    
+    def _process_expenses(self, df_negativos, donante_upper=None):
+        """Process negative transactions for expense tracking.
+        
+        donante_upper may hold the already uppercased DONANTE column of a
+        superset of df_negativos (aligned on the index).
+        """
+        if donante_upper is None:
+            donante_upper = df_negativos['DONANTE'].str.upper()
+        else:
+            donante_upper = donante_upper.loc[df_negativos.index]
         
-        for _, pdf_row in pdf_data.iterrows():
-            pid = pdf_row['ID de la operación']
-            matches = unified_data[unified_data["ID DE OPERACIÓN EN MERCADO PAGO"] == pid]
-            uni = matches.iloc[0].to_dict() if not matches.empty else {}
-            
-            # Get date from best source
-            fecha_raw = uni.get(cols_map.get('FECHA DE ORIGEN'))
-            if pd.isna(fecha_raw):
-                fecha_raw = pdf_row.get('Fecha')
-            
-            # Convert to datetime and format
-            fecha_ts = pd.to_datetime(fecha_raw, errors="coerce")
-            fecha = fecha_ts.strftime("%d/%m/%Y %H:%M:%S") if not pd.isna(fecha_ts) else ""
-            
-            # Get other fields
-            medio = uni.get(cols_map.get('MEDIO DE PAGO'), "")
-            tipo_id = uni.get(cols_map.get('TIPO DE IDENTIFICACIÓN DEL PAGADOR'), "")
-            num_id = uni.get(cols_map.get('NÚMERO DE IDENTIFICACIÓN DEL PAGADOR'), "")
-            pagador = uni.get(cols_map.get('PAGADOR'), "")
-            detalle = uni.get(cols_map.get('DETALLE DE LA VENTA'), "")
-            
-            final_rows.append({
-                'ID DE LA OPERACION': pid,
-                'FECHA': fecha,
-                'MEDIO DE PAGO': medio,
-                'TIPO DE IDENTIFICACIÓN DEL PAGADOR': tipo_id,
-                'NÚMERO DE IDENTIFICACIÓN DEL PAGADOR': num_id,
-                'PAGADOR': pagador,
-                'DETALLE DE LA VENTA': detalle,
-                'Descripción': pdf_row['Descripción'],
-                'VALOR': pdf_row.get('Valor')
-            })
-        
-        return final_rows
-    
-    def _process_expenses(self, df_negativos):
-        """Process negative transactions for expense tracking."""
         # Filter expenses based on keywords
-        pattern = '|'.join(map(re.escape, self.config.EXPENSE_KEYWORDS))
-        df = df_negativos[df_negativos['DONANTE'].str.upper().str.contains(pattern, regex=True, na=False)].copy()
+        df = df_negativos[donante_upper.str.contains(_EXPENSE_RE, na=False)].copy()
         
         # Convert date column for filtering
         df['FECHA'] = pd.to_datetime(df['FECHA'], format="%d/%m/%Y %H:%M:%S", errors='coerce')
         
         # Filter Cabify transactions - keep only weekend rides
-        mask_cabify = df['DONANTE'].str.upper().str.contains(r'\bCABIFY\b', na=False)
+        mask_cabify = donante_upper.loc[df.index].str.contains(_CABIFY_RE, na=False)
         mask_weekend = df['FECHA'].dt.weekday.isin([5, 6])  # sábado=5, domingo=6
         df = df[~(mask_cabify & ~mask_weekend)].copy()
         
@@ -441,9 +639,10 @@ class DataCombiner:
         })
         
         # Calculate expense type based on provider name
+        provider_upper = donante_upper.loc[df.index]
         conditions = [
-            df['Nombre de Proveedor'].str.upper().str.contains(r'\b(?:WALTER EDUARDO PEREZ|VETERINAR|LINARES, MARCELO)\b'),
-            df['Nombre de Proveedor'].str.upper().str.contains(r'\bCABIFY\b')
+            provider_upper.str.contains(_VET_RE),
+            provider_upper.str.contains(_CABIFY_RE)
         ]
         df['Tipo de gasto'] = np.select(conditions, ['Veterinaria', 'Transporte'], default='Alimentos')
         
@@ -473,6 +672,9 @@ class DataCombiner:
 class GoogleSheetsUploader:
     """Class to upload data to Google Sheets."""
     
+    # Rows sent per append request, well under the API payload limits
+    CHUNK_ROWS = 5000
+    
     def __init__(self, config: Config):
         self.config = config
     
@@ -499,29 +701,23 @@ class GoogleSheetsUploader:
             spreadsheet = gc.open_by_key(self.config.SPREADSHEET_ID)
             worksheet = spreadsheet.worksheet(self.config.WORKSHEET_NAME)
             
-            # Get existing data
-            existing_data = worksheet.get_all_values()
+            # Only the header row is needed to decide what to append
+            headers_exist = worksheet.row_values(1)
             
-            if len(existing_data) > 0:
+            if headers_exist:
                 # Convert DataFrame to list of lists
                 valores = df.values.tolist()
                 
-                # Check if there are only headers
-                if len(existing_data) == 1:
-                    worksheet.append_rows(valores)
-                else:
-                    # Check if headers match
-                    headers_exist = existing_data[0]
-                    if headers_exist == df.columns.tolist():
-                        worksheet.append_rows(valores)
-                    else:
-                        logger.warning("Headers don't match exactly, appending anyway")
-                        worksheet.append_rows(valores)
+                # Check if headers match
+                if headers_exist != df.columns.tolist():
+                    logger.warning("Headers don't match exactly, appending anyway")
             else:
                 # If sheet is empty, include headers
                 headers = df.columns.tolist()
-                all_values = [headers] + df.values.tolist()
-                worksheet.append_rows(all_values)
+                valores = [headers] + df.values.tolist()
+            
+            for start in range(0, len(valores), self.CHUNK_ROWS):
+                worksheet.append_rows(valores[start:start + self.CHUNK_ROWS], insert_data_option='INSERT_ROWS')
                 
             logger.info(f"Successfully uploaded {len(df)} rows to Google Sheets")
             return True
@@ -537,7 +733,7 @@ class TransactionProcessor:
     def __init__(self):
         self.config = Config()
         self.pdf_extractor = PDFExtractor()
-        self.excel_processor = ExcelProcessor()
+        self.excel_processor = ExcelProcessor(self.config)
         self.data_combiner = DataCombiner(self.config)
         self.sheets_uploader = GoogleSheetsUploader(self.config)
     
@@ -571,18 +767,43 @@ class TransactionProcessor:
     def _extract_from_pdfs(self) -> Optional[str]:
         """Extract transactions from all PDFs in the folder."""
         # Get all PDF files in the folder
-        pdf_files = glob.glob(os.path.join(self.config.PDF_FOLDER, "*.pdf"))
+        pdf_files = _list_files(self.config.PDF_FOLDER, (".pdf",))
         
         if not pdf_files:
             logger.warning("No PDF files found in the specified folder.")
             return None
         
-        # Extract transactions from all PDFs
+        # PDFs unchanged since a previous run are served from the cache
+        cache_paths = {pdf_file: self._extraction_cache_path(pdf_file) for pdf_file in pdf_files}
+        results = {}
+        pending = []
+        for pdf_file, cache_path in cache_paths.items():
+            cached = load_json_from_file(cache_path) if os.path.isfile(cache_path) else None
+            if cached is None:
+                pending.append(pdf_file)
+            else:
+                results[pdf_file] = cached
+        
+        # Extract transactions from the other PDFs; parsing is CPU-bound, so
+        # files are spread over worker processes
+        if len(pending) > 1:
+            workers = min(len(pending), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                extracted = list(executor.map(self.pdf_extractor.extract_from_file, pending))
+        else:
+            extracted = [self.pdf_extractor.extract_from_file(pdf_file) for pdf_file in pending]
+        
+        for pdf_file, transactions in zip(pending, extracted):
+            # An empty result may come from a failed parse, so it is not cached
+            if transactions and ensure_directory_exists(self.config.PDF_CACHE_FOLDER):
+                save_json_to_file(transactions, cache_paths[pdf_file])
+            results[pdf_file] = transactions
+        self._prune_extraction_cache(set(cache_paths.values()))
+        
         all_transactions = []
         
         for pdf_file in pdf_files:
-            transactions = self.pdf_extractor.extract_from_file(pdf_file)
-            
+            transactions = results[pdf_file]
             # Add file source information
             for t in transactions:
                 t['Source File'] = os.path.basename(pdf_file)
@@ -596,23 +817,38 @@ class TransactionProcessor:
         # Create DataFrame
         df = pd.DataFrame(all_transactions)
         
-        # Clean up and sort data
+        # Clean up and sort data; dates stay real dates and are formatted by
+        # the Excel writer, unparseable ones are left empty
         if 'Fecha' in df.columns:
-            try:
-                df['Fecha'] = pd.to_datetime(df['Fecha'], format='%d-%m-%Y')
-                df = df.sort_values('Fecha')
-                df['Fecha'] = df['Fecha'].dt.strftime('%d-%m-%Y')
-            except Exception as e:
-                logger.warning(f"Could not sort by date: {e}")
+            df['Fecha'] = pd.to_datetime(df['Fecha'], format='%d-%m-%Y', errors='coerce', cache=True)
+            df.sort_values('Fecha', inplace=True, kind='stable')
         
         # Export to Excel
         output_file = os.path.join(self.config.PDF_FOLDER, 
                                   f"transferencias_recibidas_{len(df)}_registros.xlsx")
-        df.to_excel(output_file, index=False)
+        with pd.ExcelWriter(output_file, date_format='dd-mm-yyyy', datetime_format='dd-mm-yyyy') as writer:
+            df.to_excel(writer, index=False)
         
         logger.info(f"Extracted {len(df)} transactions from PDFs to {output_file}")
         return output_file
     
+    def _extraction_cache_path(self, pdf_file: str) -> str:
+        """Get the cache file for a PDF; any change to the PDF or the extractor yields a new path."""
+        key = (f"{os.path.basename(pdf_file)}_{os.path.getmtime(pdf_file):.0f}_{os.path.getsize(pdf_file)}"
+               f"_v{PDFExtractor.VERSION}")
+        return os.path.join(self.config.PDF_CACHE_FOLDER, key + ".json")
+    
+    def _prune_extraction_cache(self, keep: set) -> None:
+        """Delete cached extractions of PDFs that changed or are gone, or of an older extractor."""
+        if not os.path.isdir(self.config.PDF_CACHE_FOLDER):
+            return
+        for entry in os.scandir(self.config.PDF_CACHE_FOLDER):
+            if entry.is_file() and entry.name.endswith(".json") and entry.path not in keep:
+                try:
+                    os.remove(entry.path)
+                except OSError as e:
+                    logger.warning(f"Could not remove stale cache {entry.path}: {e}")
+    
     def _merge_excel_files(self) -> Optional[str]:
         """Merge all Excel files in the folder."""
         return self.excel_processor.merge_excel_files(self.config.EXCEL_FOLDER)
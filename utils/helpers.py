@@ -30,6 +30,16 @@ def ensure_directory_exists(directory_path: str) -> bool:
         logger.error(f"Failed to create directory {directory_path}: {str(e)}")
         return False
 
+def get_cache_dir() -> str:
+    """Get the directory for local caches, creating it if necessary.
+    
+    Returns:
+        The CACHE_DIR env var, or ~/.cache/rescataditos when it is not set
+    """
+    cache_dir = os.getenv("CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "rescataditos")
+    ensure_directory_exists(cache_dir)
+    return cache_dir
+
 def save_json_to_file(data: Dict[str, Any], file_path: str) -> bool:
     """Save data as JSON to a file.
     